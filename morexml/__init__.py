@@ -35,7 +35,9 @@ third-party dependencies
 
 from __future__ import absolute_import
 
-from . import xmlpath
+from . import (
+    xmlpath, xmlindex, xmlquery, xmldiff, xmlbuild, xmltemplate, xmlelement,
+    xmlschema, xmltransform)
 from .xml import XML
 
 __import__('zetup').toplevel(__name__, (
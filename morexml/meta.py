@@ -18,13 +18,123 @@
 
 from __future__ import absolute_import
 
-from lxml.etree import Element  # pylint: disable=no-name-in-module
-from moretools import SimpleTree, cached, getfunc, qualname
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from weakref import WeakValueDictionary
+
+from moretools import SimpleTree, qualname
 from six import text_type as unicode
 
 from .tools import pyname_to_xmlname
+from .xmlelement import make_element
+
+__all__ = ('TagClassCache', 'XMLMeta')
+
+
+#: The statistics of a :class:`morexml.meta.TagClassCache`.
+CacheInfo = namedtuple(
+    'CacheInfo', ('hits', 'misses', 'evictions', 'maxsize', 'currsize'))
+
+
+class TagClassCache(object):
+    """
+    LRU-bounded cache of ``XML['...']`` factory classes.
+
+    At most `maxsize` classes are strongly referenced, or all if ``None``.
+    Evicted classes are only garbage collected when nothing else refers to
+    them anymore. Until then, they are still returned, so that every tag
+    always has exactly one class:
+
+    >>> from morexml import XML
+
+    >>> XML['name'] is XML['name']
+    True
+
+    >>> XML.tag_cache.info()
+    CacheInfo(hits=..., misses=..., evictions=..., maxsize=4096, currsize=...)
+    """
+
+    def __init__(self, maxsize=4096):
+        """Create an empty cache for `maxsize` classes."""
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self.clear()
+
+    def get(self, key, create):
+        """Get the class for `key`, or create it by calling `create`."""
+        with self._lock:
+            lru = self._lru
+            try:
+                cls = lru.pop(key)
+            except KeyError:
+                cls = self._live.get(key)
+                if cls is None:
+                    self._misses += 1
+                    cls = self._live[key] = create()
+                else:
+                    self._hits += 1
+            else:
+                self._hits += 1
+            lru[key] = cls
+
+            maxsize = self.maxsize
+            if maxsize is not None:
+                while len(lru) > maxsize:
+                    lru.popitem(last=False)
+                    self._evictions += 1
+            return cls
+
+    def info(self):
+        """Get the cache statistics as ``CacheInfo`` named tuple."""
+        return CacheInfo(
+            self._hits, self._misses, self._evictions, self.maxsize,
+            len(self._lru))
+
+    def clear(self):
+        """Drop all strong references and reset the statistics."""
+        self._lru = OrderedDict()
+        self._live = WeakValueDictionary()
+        self._hits = self._misses = self._evictions = 0
+
+
+def tagged_init(self, attrs=None, xmlns=None, **kwattrs):
+    """
+    Create an XML element with the tag of this ``XML['...']`` class.
 
-__all__ = ('XMLMeta', )
+    >>> from morexml import XML
+    >>> XML['name'](some_attr='value')
+    XML['name']:
+    <name some-attr="value"/>
+    """
+    tag = type(self)._tag
+    if not tag.startswith('{') and ':' in tag:
+        # HACK: lxml Element creation doesn't support prefix:name tag scheme
+        # ==> temporarily store prefix and prepend {URI} later to Element tag
+        self._prefix, name = tag.split(':', 1)
+    else:
+        name = tag
+
+    # HACK: lxml Element creation also doesn't support prefix:name scheme for
+    # attributes ==> also temporarily store all attributes and exchange
+    # prefixes with {URI}s later before finally adding attributes to lxml
+    # Element
+    self._attrs = dict(attrs) if attrs is not None else {}
+    self._attrs.update({
+        pyname_to_xmlname(attr): unicode(value)
+        for attr, value in kwattrs.items()})
+
+    nsmeta = type(XMLMeta.NS)  # pylint: disable=no-member
+    if nsmeta.context_stack:
+        nsctx = dict(nsmeta.context_stack[-1])
+        if xmlns is not None:
+            nsctx.update(xmlns)
+        xmlns = nsctx
+
+    self._element = make_element(name, nsmap=xmlns)
+    self._wrappers[self._element] = self
+    # init tree last because self._element must exist to make the implicit
+    # parent assignment work
+    self._init_tree()
 
 
 class XMLMeta(type(SimpleTree)):
@@ -38,7 +148,11 @@ class XMLMeta(type(SimpleTree)):
     #: The tag name of an ``XML['name']`` or ``XML['prefix:name']`` class
     _tag = None
 
-    @cached
+    #: The cache of all ``XML['...']`` classes, with statistics.
+    #:
+    #: Its ``maxsize`` can be changed at any time
+    tag_cache = TagClassCache()
+
     def __getitem__(cls, tag):  # pylint: disable=no-self-argument
         """
         Create derived :class:`morexml.XML` factory classes with an XML tag.
@@ -53,7 +167,7 @@ class XMLMeta(type(SimpleTree)):
         XML['name']:
         <name attr="value"/>
 
-        The created classes are cached:
+        The created classes are cached in :attr:`.tag_cache`:
 
         >>> XML['name'] is XML['name']
         True
@@ -62,56 +176,13 @@ class XMLMeta(type(SimpleTree)):
             raise TypeError(
                 "{!r} already has tag {!r}".format(cls, cls._tag))
 
-        class taggedcls(cls):
-            """Sub-class of :class:`morexml.XML` factory for XML tag {!r}."""
-
-            __module__ = cls.__module__
-
-            _tag = tag
-
-            def __init__(self, attrs=None, xmlns=None, **kwattrs):
-                """
-                Create an XML <{tag}> element.
-
-                >>> from morexml import XML
-                >>> XML[{tag!r}](some_attr='value')
-                XML[{tag!r}]:
-                <{tag} some-attr="value"/>
-                """
-                tag = type(self)._tag
-                if not tag.startswith('{') and ':' in tag:
-                    # HACK: lxml Element creation doesn't support prefix:name
-                    # tag scheme ==> temporarily store prefix and prepend
-                    # {URI} later to Element tag
-                    self._prefix, name = tag.split(':', 1)
-                else:
-                    name = tag
-
-                # HACK: lxml Element creation also doesn't support prefix:name
-                # scheme for attributes ==> also temporarily store all
-                # attributes and exchange prefixes with {URI}s later before
-                # finally adding attributes to lxml Element
-                self._attrs = dict(attrs) if attrs is not None else {}
-                self._attrs.update({
-                    pyname_to_xmlname(attr): unicode(value)
-                    for attr, value in kwattrs.items()})
-
-                nsmeta = type(type(cls).NS)  # pylint: disable=no-member
-                if nsmeta.context_stack:
-                    nsctx = dict(nsmeta.context_stack[-1])
-                    if xmlns is not None:
-                        nsctx.update(xmlns)
-                    xmlns = nsctx
-
-                self._element = Element(name, nsmap=xmlns)
-                # call basic SimpleTree.__init__ last because self._element
-                # must exist to make the implicit parent assignment in
-                #  SimpleTree.__init__ work
-                SimpleTree.__init__(self)  # pylint: disable=bad-super-call
-
-        taggedcls.__name__ = tag
-        taggedcls.__qualname__ = "{}[{!r}]".format(qualname(cls), tag)
-        taggedcls.__doc__ = taggedcls.__doc__.format(tag)
-        __init__ = getfunc(taggedcls.__init__)
-        __init__.__doc__ = __init__.__doc__.format(tag=tag)
-        return taggedcls
+        return XMLMeta.tag_cache.get((cls, tag), lambda: type(cls)(
+            str(tag), (cls, ), {
+                '__module__': cls.__module__,
+                '__qualname__': "{}[{!r}]".format(qualname(cls), tag),
+                '__doc__': "Sub-class of :class:`morexml.XML` factory "
+                           "with an XML tag.",
+                '__init__': tagged_init,
+                '__slots__': (),
+                '_tag': tag,
+            }))
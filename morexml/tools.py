@@ -18,7 +18,14 @@
 
 from __future__ import absolute_import
 
-__all__ = ('pyname_to_xmlname', 'xmlname_to_pyname')
+from threading import local
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python < 3.7
+    ContextVar = None
+
+__all__ = ('ContextStack', 'pyname_to_xmlname', 'xmlname_to_pyname')
 
 
 def xmlname_to_pyname(name):
@@ -43,3 +50,92 @@ def pyname_to_xmlname(name):
     'some-name'
     """
     return name.replace('_', '-')
+
+
+class ContextStack(object):
+    """
+    A stack of active context managers, separate per thread and task.
+
+    Stored in a ``contextvars.ContextVar``, so every thread and every
+    ``asyncio`` task has its own stack, with tasks starting from the stack
+    active at their creation. Falls back to thread-local storage if
+    ``contextvars`` is not available:
+
+    >>> stack = ContextStack('example')
+    >>> stack.append('outer')
+    >>> stack.append('inner')
+    >>> stack[-1]
+    'inner'
+
+    >>> from threading import Thread
+    >>> thread = Thread(target=lambda: stack.append('other'))
+    >>> thread.start(); thread.join()
+
+    >>> stack.pop(-1)
+    'inner'
+    >>> list(stack)
+    ['outer']
+
+    Supports the ``list`` operations used for context management. Every
+    change replaces the stored ``tuple``
+    """
+
+    def __init__(self, name):
+        """Create an empty stack with a `name` for its context variable."""
+        self._name = name
+        if ContextVar is not None:
+            self._var = ContextVar(name, default=())
+        else:  # pragma: no cover
+            self._local = local()
+
+    if ContextVar is not None:
+        def _get(self):
+            return self._var.get()
+
+        def _set(self, items):
+            self._var.set(items)
+
+    else:  # pragma: no cover
+        def _get(self):
+            return getattr(self._local, 'items', ())
+
+        def _set(self, items):
+            self._local.items = items
+
+    @property
+    def _list(self):
+        """Get the current ``tuple`` of stack items, like ``SimpleTree``."""
+        return self._get()
+
+    def append(self, item):
+        """Put `item` on top of the current stack."""
+        self._set(self._get() + (item, ))
+
+    def pop(self, index=-1):
+        """Remove and get the top item of the current stack."""
+        if index != -1:
+            raise ValueError(
+                "{!r} can only pop the top item".format(self))
+
+        items = self._get()
+        if not items:
+            raise IndexError("pop from empty {!r}".format(self))
+
+        self._set(items[:-1])
+        return items[-1]
+
+    def __getitem__(self, index):
+        return self._get()[index]
+
+    def __len__(self):
+        return len(self._get())
+
+    def __iter__(self):
+        return iter(self._get())
+
+    def __contains__(self, item):
+        return any(entry is item for entry in self._get())
+
+    def __repr__(self):
+        return "<ContextStack {!r}: {!r}>".format(
+            self._name, list(self._get()))
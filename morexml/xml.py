@@ -18,19 +18,158 @@
 
 from __future__ import absolute_import
 
+from collections import deque
+from hashlib import new as new_hash, sha1
+from operator import getitem
+from weakref import WeakValueDictionary
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+except ImportError:  # pragma: no cover  # Python 2 without futures backport
+    ProcessPoolExecutor = ThreadPoolExecutor = None
+
 import zetup
-from lxml.etree import tounicode  # pylint: disable=no-name-in-module
-from moretools import SimpleTree, dictitems, isinteger, qualname
-from six import PY2, text_type as unicode, with_metaclass
+from lxml.etree import (  # pylint: disable=no-name-in-module
+    Element, ElementTree, fromstring, iterparse, parse, tostring, tounicode)
+from moretools import SimpleTree, isinteger, qualname
+from six import (
+    PY2, reraise, string_types, text_type as unicode, with_metaclass)
+from six.moves import copyreg
 
 import morexml
 from .meta import XMLMeta
+from .tools import ContextStack
+from .xmlelement import LOOKUP, copy_element, make_parser, parse_element
 from .xmllist import List
-from .xmlns import NSLookupError
+from .xmlns import NSLookupError, NSScope
 
 __all__ = ('XML', )
 
 
+def element_digest(element, wrappers, cache=None):
+    """
+    Compute the structural digest of lxml `element` and its sub-elements.
+
+    Digests already cached in XML instances from the `wrappers` mapping are
+    reused, and new ones are cached there. If an additional `cache` ``dict``
+    is given, the digests of all lxml elements are also stored in there
+    """
+    xml = wrappers.get(element)
+    if xml is not None and xml._digest is not None:
+        digest = xml._digest
+    else:
+        hashed = sha1(repr((
+            element.tag, sorted(element.items()), element.text,
+        )).encode('utf-8'))
+        for child in element.iterchildren(Element):
+            hashed.update(element_digest(child, wrappers, cache))
+
+        digest = hashed.digest()
+        if xml is not None:
+            xml._digest = digest
+    if cache is not None:
+        cache[element] = digest
+    return digest
+
+
+class HashStream(object):
+    """A write-only file object, which feeds all written data to a hash."""
+
+    __slots__ = ('hash', )
+
+    def __init__(self, hashed):
+        """Create a stream for feeding the `hashed` ``hashlib`` object."""
+        self.hash = hashed
+
+    def write(self, data):
+        """Update the hash with `data` ``bytes``."""
+        self.hash.update(data)
+
+
+def iter_toplevel(events):
+    """
+    Filter the completed top-level sub-elements from lxml `events`.
+
+    The `events` are ``(event, element)`` pairs from lxml ``iterparse`` with
+    ``'start'`` and ``'end'`` events
+    """
+    depth = 0
+    for event, element in events:
+        if event == 'start':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 1:
+                yield element
+
+
+def map_in_worker(func, chunk):
+    """
+    Call `func` with XML trees parsed from a `chunk` of XML text ``bytes``.
+
+    Resulting XML trees are serialized again, to be handed over from a
+    worker process. The results come as ``(is_xml, result)`` pairs
+    """
+    results = []
+    for xmltext in chunk:
+        result = func(XML(xmltext))
+        if isinstance(result, XML):
+            results.append((True, tostring(result.element, encoding='utf-8')))
+        else:
+            results.append((False, result))
+    return results
+
+
+def build_in_worker(func, xmlns, item, serialize=False):
+    """
+    Call `func` with `item` to build an XML tree in a pool worker.
+
+    Within an :class:`morexml.XML.NS` context with `xmlns`, if given. With
+    `serialize`, the tree is returned as XML text ``bytes``, for handing it
+    over from a worker process
+    """
+    if xmlns:
+        with XML.NS(xmlns):  # pylint: disable=not-context-manager
+            xml = func(item)
+    else:
+        xml = func(item)
+    if serialize:
+        return tostring(xml.element, encoding='utf-8')
+
+    return xml
+
+
+def unpickle_xml(xmltext, digest=None):
+    """
+    Recreate a pickled :class:`morexml.XML` tree from its XML text ``bytes``.
+
+    Only the lxml ``Element`` tree is parsed. The XML instances of its
+    sub-trees are created on first access. A pickled `digest` is reused
+    """
+    xml = XML._wrap(parse_element(xmltext))
+    if digest is not None:
+        XML._digested = True
+        xml._digest = digest
+    return xml
+
+
+def reduce_xml_class(cls):
+    """
+    Reduce :class:`morexml.XML` factory classes for pickling.
+
+    ``XML['...']`` and ``.root`` classes are pickled as lookups from their
+    base classes, which recreates them via :attr:`morexml.XML.tag_cache`
+    """
+    tag = cls._tag
+    if tag is not None and '_tag' in vars(cls):
+        return getitem, (cls.__bases__[0], tag)
+
+    if vars(cls).get('_is_simpletree_root', False):
+        return getattr, (cls.__bases__[0], 'root')
+
+    return cls.__name__
+
+
 class XML(with_metaclass(XMLMeta, SimpleTree)):
     """
     The :class:`morexml.XML` factory.
@@ -121,17 +260,49 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
     # used by zetup.meta's class __repr__ instead of __module__
     __package__ = morexml
 
-    #: A temporary prefix store for creation of ``XML['prefix:name']`` trees.
-    _prefix = None
-
-    #: A temporary store for supporting ``{'prefix:name': 'value'}`` attributes.
-    _attrs = None
-
-    #: The internal lxml ``Element`` instance as node of this XML (sub-)tree.
-    _element = None
-
-    #: The parent XML tree instance of this sub-tree.
-    _parent = None
+    # compact nodes without instance __dict__, if base classes allow
+    __slots__ = (
+        # a temporary prefix store for creation of XML['prefix:name'] trees
+        '_prefix',
+        # a temporary store for supporting {'prefix:name': 'value'} attributes
+        '_attrs',
+        # the internal lxml Element instance as node of this XML (sub-)tree
+        '_element',
+        # the parent XML tree instance of this sub-tree
+        '_parent',
+        # the cached namespace scope of this XML (sub-)tree
+        '_scope',
+        # the cached structural digest of this XML (sub-)tree
+        '_digest',
+        # the lazily created sub-tree container, see .sub
+        '_sub',
+    ) + (() if hasattr(SimpleTree, '__weakref__') else ('__weakref__', ))
+
+    def __new__(cls, *args, **kwargs):
+        """Create an XML (sub-)tree instance with all slots unset."""
+        xml = SimpleTree.__new__(cls)
+        xml._prefix = xml._attrs = xml._element = xml._parent = None
+        xml._scope = xml._digest = xml._sub = None
+        return xml
+
+    #: All existing XML (sub-)tree instances by their lxml ``Element`` nodes.
+    #:
+    #: Used for lazily wrapping lxml ``Element`` nodes without ever creating
+    #: two XML instances for the same node
+    _wrappers = WeakValueDictionary()
+
+    #: Whether any digest was computed yet, to skip invalidation before.
+    _digested = False
+
+    #: Whether to mirror the lxml tree links in the XML tree instances.
+    #:
+    #: By default, every XML tree caches its :attr:`.parent` and the list of
+    #: its :attr:`.sub` trees, with indexes. After ``XML.mirror = False``,
+    #: the lxml tree is the only source of truth for all XML trees, and the
+    #: links are derived from the lxml tree on every access. Then direct
+    #: changes of the lxml trees are always reflected. It can be switched at
+    #: any time, and links cached before are dropped on next access.
+    mirror = True
 
     class sub(zetup.object):
         """
@@ -149,9 +320,36 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
         >>> xml.sub
         XML['name'].sub: ['sub-name', 'other-name']
 
+        Without :attr:`morexml.XML.mirror`, the sub-trees are always derived
+        from the lxml tree, also if cached before:
+
+        >>> XML.mirror = False
+        >>> with xml:
+        ...     XML['sub-name']()
+        XML[...
+
+        >>> xml.sub
+        XML['name'].sub: ['sub-name', 'other-name', 'sub-name']
+        >>> xml.sub['sub-name']
+        XML.List: ['sub-name', 'sub-name']
+
+        >>> XML.mirror = True
+
         See :meth:`.__getitem__` for more details
         """
 
+        __slots__ = (
+            # the XML tree owning this container
+            '_owner',
+            # the internal list of XML sub-trees, created on first access
+            '_items',
+            # optional index of the XML sub-trees by tag, created on first use
+            '_tag_index',
+            # optional indexes of the XML sub-trees by value of an attribute,
+            # every attribute gets its own index on first use as filter
+            '_xmlattr_indexes',
+        )
+
         def __init__(self, owner):
             """
             Initialize internal XML sub-tree list.
@@ -160,7 +358,100 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
             `owner` instance
             """
             self._owner = owner
-            self._list = []
+            self._items = self._tag_index = self._xmlattr_indexes = None
+
+        @property
+        def _list(self):
+            """
+            Get the internal ``list`` of XML sub-trees.
+
+            Wraps the owner's lxml ``Element`` children on first access, or on
+            every access without :attr:`morexml.XML.mirror`
+            """
+            items = self._items
+            owner = self._owner
+            if items is None or not owner.mirror:
+                if items is not None:
+                    self._items = self._tag_index = None
+                    self._xmlattr_indexes = None
+                wrap = XML._wrap  # pylint: disable=protected-access
+                items = [
+                    wrap(element, parent=owner)
+                    for element in owner.element.iterchildren(Element)]
+                if owner.mirror:
+                    self._items = items
+            return items
+
+        def _append(self, xml):
+            """Add `xml` as last sub-tree, and also to all existing indexes."""
+            if not self._owner.mirror or self._items is None:
+                # nothing mirrored yet ==> derived from lxml on next access
+                return
+
+            self._items.append(xml)
+            if self._tag_index is not None:
+                self._tag_index.setdefault(xml.tag, []).append(xml)
+            if self._xmlattr_indexes:
+                get = xml.element.get
+                for xmlattr, index in self._xmlattr_indexes.items():
+                    value = get(xmlattr)
+                    if value is not None:
+                        index.setdefault(value, []).append(xml)
+
+        def _by_tag(self, tag):
+            """Get all XML sub-trees with `tag` from the tag index."""
+            index = self._tag_index
+            if index is None or not self._owner.mirror:
+                index = {}
+                for xml in self._list:
+                    index.setdefault(xml.tag, []).append(xml)
+                if self._owner.mirror:
+                    self._tag_index = index
+            return index.get(tag, ())
+
+        def _by_xmlattr(self, xmlattr, value):
+            """Get all XML sub-trees with `xmlattr` `value` from its index."""
+            indexes = self._xmlattr_indexes
+            if indexes is None or not self._owner.mirror:
+                indexes = {}
+                if self._owner.mirror:
+                    self._xmlattr_indexes = indexes
+            index = indexes.get(xmlattr)
+            if index is None:
+                index = indexes[xmlattr] = {}
+                for xml in self._list:
+                    xmlvalue = xml.element.get(xmlattr)
+                    if xmlvalue is not None:
+                        index.setdefault(xmlvalue, []).append(xml)
+            return index.get(value, ())
+
+        def _changed(self):
+            """Reset indexes and invalidate owner's digests and indexes."""
+            self._tag_index = self._xmlattr_indexes = None
+            owner = self._owner
+            owner._touch()  # pylint: disable=protected-access
+            type(owner).Index.invalidate(owner)
+
+        def _insert(self, position, xml):
+            """Insert `xml` as sub-tree at `position`."""
+            items = self._list
+            if position < len(items):
+                items[position].element.addprevious(xml.element)
+            else:
+                self._owner.element.append(xml.element)
+            items.insert(position, xml)
+            xml._parent = self._owner  # pylint: disable=protected-access
+            xml._rescope()  # pylint: disable=protected-access
+            self._changed()
+
+        def _pop(self, position):
+            """Remove and get the sub-tree at `position`."""
+            xml = self._list.pop(position)
+            self._owner.element.remove(xml.element)
+            xml._parent = None  # pylint: disable=protected-access
+            xml._rescope()  # pylint: disable=protected-access
+            self._changed()
+            return xml
 
         def __len__(self):
             """Get the number of sub-trees."""
@@ -189,12 +480,26 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
 
             >>> xml.sub(attr='other value')
             XML.List: ['other-name', 'sub-name']
+
+            Sub-trees are looked up via per-tag and per-attribute indexes,
+            which are created on first use, and kept up-to-date when further
+            sub-trees are added. So filtering many sub-trees by key attributes
+            is a simple ``dict`` access
             """
+            xmlattr_items = list(xmlattr_filter.items())
+            if xmlattr_items:
+                candidates = self._by_xmlattr(*xmlattr_items.pop(0))
+            elif len(tag_filter) == 1:
+                candidates = self._by_tag(tag_filter[0])
+            else:
+                candidates = self._list
+
             def select():
-                for xml in self:
+                for xml in candidates:
+                    get = xml.element.get
                     if (not tag_filter or xml.tag in tag_filter) and all(
-                            xml[attr] == value
-                            for attr, value in xmlattr_filter.items()):
+                            get(attr) == value
+                            for attr, value in xmlattr_items):
                         yield xml
 
             return type(self._owner).List(select())
@@ -262,8 +567,7 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
             if isinstance(key, slice):
                 return type(self._owner).List(self._list[key])
 
-            return type(self._owner).List(
-                xml for xml in self if xml.tag == key)
+            return type(self._owner).List(self._by_tag(key))
 
         def __eq__(self, other):
             """
@@ -313,25 +617,387 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
             return "{}.sub: {!r}".format(
                 qualname(type(self._owner)), [xml.tag for xml in self])
 
-    def __init__(self, xmltext=None):
-        """Create XML tree from parsing XML text."""
-        raise NotImplementedError(
-            "Instantiating morexml.XML from XML text is not implemented yet")
+    def __init__(self, xmltext):
+        """
+        Create XML tree from parsing XML text.
+
+        The `xmltext` can be given as ``str``, ``bytes``, or readable file
+        object. The whole lxml ``Element`` tree is parsed at once, but
+        :class:`morexml.XML` instances for its sub-trees are only created when
+        first accessed via :attr:`.sub`, :attr:`.parent`, or iteration:
+
+        >>> from morexml import XML
+        >>> xml = XML('<name attr="value"><sub-name/><other-name/></name>')
+        >>> xml
+        XML:
+        <name attr="value">
+          <sub-name/>
+          <other-name/>
+        </name>
+
+        >>> xml.sub
+        XML.sub: ['sub-name', 'other-name']
+
+        >>> xml.sub[1]
+        XML['other-name']:
+        <other-name/>
+
+        >>> xml.sub[1].parent is xml
+        True
+        """
+        if hasattr(xmltext, 'read'):
+            parser = make_parser(remove_blank_text=True)
+            element = parse(xmltext, parser).getroot()
+        else:
+            if isinstance(xmltext, unicode):
+                # lxml refuses unicode text with an encoding declaration
+                xmltext = xmltext.encode('utf-8')
+                parser = make_parser(remove_blank_text=True, encoding='utf-8')
+            else:
+                parser = make_parser(remove_blank_text=True)
+            element = fromstring(xmltext, parser)
+
+        self._element = element
+        self._wrappers[element] = self
+        self._init_tree()
+
+    def _init_tree(self):
+        """
+        Replace ``SimpleTree.__init__``, without creating :attr:`.sub`.
+
+        Makes this tree a sub-tree of the XML tree from the current ``with``
+        context, if any, and if this is not a ``.root`` class instance
+        """
+        parent = None
+        cls = type(self)
+        if not getattr(cls, '_is_simpletree_root', False):
+            stack = type(cls).context_stack
+            if stack:
+                parent = stack[-1]
+        self.parent = parent
+
+    @classmethod
+    def _wrap(cls, element, parent=None):
+        """
+        Get the :class:`morexml.XML` instance of an lxml `element` node.
+
+        Creates an instance of the according ``XML['...']`` class on first
+        access, without going through the factory's instantiation machinery.
+        The optional `parent` XML tree becomes the instance's parent
+        """
+        try:
+            xml = cls._wrappers[element]
+        except KeyError:
+            tag = element.tag
+            prefix = element.prefix
+            if prefix is not None:
+                tag = ':'.join((prefix, tag.rsplit('}', 1)[-1]))
+            xmlcls = XML[tag]
+            xml = xmlcls.__new__(xmlcls)
+            xml._element = element
+            cls._wrappers[element] = xml
+        if parent is not None:
+            xml._parent = parent
+        return xml
+
+    @classmethod
+    def _adopt(cls, element, root=False):
+        """
+        Get the :class:`morexml.XML` instance of a new lxml `element` tree.
+
+        Unless `root` is set, it becomes a sub-tree of the XML tree from the
+        current ``with`` context, if any
+        """
+        xml = cls._wrap(element)
+        if not root:
+            stack = type(XML).context_stack
+            if stack:
+                xml.parent = stack[-1]
+        return xml
+
+    @classmethod
+    def build(cls, spec, xmlns=None):
+        """
+        Create a whole XML tree from a nested ``(tag, attrs, content)`` spec.
+
+        Without going through the factory classes for every sub-tree. See
+        :class:`morexml.XML.Builder` for details. Like instances of the
+        factory classes, the tree becomes a sub-tree of the XML tree from
+        the current ``with`` context, if any, unless created via
+        ``XML.root.build()``
+        """
+        element = cls.Builder(xmlns=xmlns).build(spec)
+        return cls._adopt(
+            element, root=getattr(cls, '_is_simpletree_root', False))
+
+    @classmethod
+    def from_records(cls, tag, records, attrs=None, xmlns=None):
+        """
+        Create an XML list tree with a `tag` entry per mapping in `records`.
+
+        The root tag comes from the factory class. Every record mapping
+        holds the attributes of one entry, with ``None`` values left out:
+
+        >>> from morexml import XML
+
+        >>> rows = ({'name': 'eth{}'.format(i), 'mtu': 1500} for i in range(2))
+        >>> XML['interfaces'].from_records('interface', rows)
+        XML['interfaces']:
+        <interfaces>
+          <interface name="eth0" mtu="1500"/>
+          <interface name="eth1" mtu="1500"/>
+        </interfaces>
+
+        Namespaces and names are resolved only once, and the entries are
+        created as plain lxml ``Element`` nodes. See
+        :class:`morexml.XML.Builder` for details
+        """
+        if cls._tag is None:
+            raise TypeError(
+                "{!r}.from_records() needs a factory class with tag, "
+                "like XML['name']".format(cls))
+
+        element = cls.Builder(xmlns=xmlns).records(
+            cls._tag, tag, records, attrs=attrs)
+        return cls._adopt(
+            element, root=getattr(cls, '_is_simpletree_root', False))
+
+    @classmethod
+    def iterparse(cls, source, tag=None, xmlns=None):
+        """
+        Iterate all XML sub-trees with `tag` by incrementally parsing `source`.
+
+        The `source` can be a file name or a readable file object. The `tag`
+        can be given in ``name``, ``prefix:name``, or ``{URI}name`` format.
+        Prefixes are looked up in the optional `xmlns` mapping and the active
+        :class:`morexml.XML.NS` context. Without `tag`, all top-level
+        sub-trees below the root are iterated:
+
+        >>> from io import BytesIO
+        >>> from morexml import XML
+
+        >>> source = BytesIO(b'''
+        ... <data xmlns:if="urn:some:interfaces">
+        ...   <if:interface name="eth0"><if:mtu>1500</if:mtu></if:interface>
+        ...   <if:interface name="eth1"><if:mtu>9000</if:mtu></if:interface>
+        ... </data>
+        ... ''')
+
+        >>> with XML.NS({'if': 'urn:some:interfaces'}):
+        ...     for xml in XML.iterparse(source, tag='if:interface'):
+        ...         print(xml['name'], xml.sub[0].text)
+        eth0 1500
+        eth1 9000
+
+        Every yielded XML sub-tree is complete. As soon as the iteration
+        continues, it is cleared from the underlying lxml tree, together
+        with all its preceding siblings. So memory usage stays proportional
+        to the largest sub-tree instead of the whole document. Sub-trees that
+        are needed longer must be copied. Matching elements must not be
+        nested in each other
+        """
+        wrap = cls._wrap
+        for element in cls._iterparse_elements(source, tag, xmlns=xmlns):
+            yield wrap(element)
+
+    @classmethod
+    def _iterparse_elements(cls, source, tag=None, xmlns=None):
+        """
+        Iterate lxml elements with `tag`, or top-level, from parsing `source`.
+
+        Clears every element from the lxml tree when iteration continues
+        """
+        if tag is not None and not tag.startswith('{') and ':' in tag:
+            prefix, name = tag.split(':', 1)
+            nsmeta = type(cls.NS)  # pylint: disable=no-member
+            nsctx = (
+                dict(nsmeta.context_stack[-1]) if nsmeta.context_stack
+                else {})
+            if xmlns is not None:
+                nsctx.update(xmlns)
+            try:
+                uri = nsctx[prefix]
+            except KeyError:
+                raise NSLookupError(
+                    "Unknown prefix {!r} in XML tag {!r}".format(prefix, tag))
+
+            tag = "{{{}}}{}".format(uri, name)
+
+        if tag is not None:
+            events = iterparse(
+                source, events=('end', ), tag=tag, remove_blank_text=True)
+            events.set_element_class_lookup(LOOKUP)
+            elements = (element for _, element in events)
+        else:
+            events = iterparse(
+                source, events=('start', 'end'), remove_blank_text=True)
+            events.set_element_class_lookup(LOOKUP)
+            elements = iter_toplevel(events)
+
+        for element in elements:
+            yield element
+
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    @classmethod
+    def map_parallel(
+            cls, func, source, tag=None, workers=None, chunksize=64,
+            xmlns=None, executor=None):
+        """
+        Call `func` for all sub-trees of `source` in worker processes.
+
+        Sub-trees are selected like in :meth:`.iterparse`, by `tag` or as
+        top-level sub-trees. The `source` is parsed incrementally, and the
+        serialized sub-trees are handed over to a pool of `workers`
+        processes, or to the given ``concurrent.futures`` `executor`, in
+        chunks of `chunksize`. Every worker parses its sub-trees into new
+        root XML trees and calls `func` with them, which must be picklable.
+
+        The results are iterated in the order of the sub-trees. Resulting
+        XML trees are handed back as serialized XML text, all other results
+        via pickling:
+
+        >>> from io import BytesIO
+        >>> from morexml import XML
+
+        >>> source = BytesIO(b'''
+        ... <data>
+        ...   <interface name="eth0"><mtu>1500</mtu></interface>
+        ...   <interface name="eth1"><mtu>9000</mtu></interface>
+        ... </data>
+        ... ''')
+
+        >>> for result in XML.map_parallel(XML.to_root, source, workers=2):
+        ...     print(result)
+        <interface name="eth0">
+          <mtu>1500</mtu>
+        </interface>
+        <interface name="eth1">
+          <mtu>9000</mtu>
+        </interface>
+
+        Only a limited number of chunks is in flight at once, so memory
+        usage stays independent of the size of `source`
+        """
+        if executor is None:
+            if ProcessPoolExecutor is None:  # pragma: no cover
+                raise RuntimeError(
+                    "{!r}.map_parallel() needs concurrent.futures"
+                    .format(cls))
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for result in cls.map_parallel(
+                        func, source, tag=tag, chunksize=chunksize,
+                        xmlns=xmlns, executor=pool):
+                    yield result
+            return
+
+        def chunks():
+            chunk = []
+            for element in cls._iterparse_elements(source, tag, xmlns=xmlns):
+                chunk.append(tostring(element, encoding='utf-8'))
+                if len(chunk) == chunksize:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        def results(future):
+            # just wrapped ==> not attached to the caller's with-context
+            for is_xml, result in future.result():
+                yield (
+                    XML._wrap(parse_element(result)) if is_xml else result)
+
+        pending = deque()
+        window = 2 * (workers or 4)
+        for chunk in chunks():
+            pending.append(executor.submit(map_in_worker, func, chunk))
+            if len(pending) >= window:
+                for result in results(pending.popleft()):
+                    yield result
+        while pending:
+            for result in results(pending.popleft()):
+                yield result
 
     def __copy__(self, root=False):
-        def copy_tree(xml, _root=False):
-            xmlcls = XML[xml.tag] if not _root else XML.root[xml.tag]
-            with xmlcls(
-                    attrs=xml.element.attrib, xmlns=xml.xmlns()
-            ) as xml_copy:
-                if xml.text is not None:
-                    xml_copy.text = xml.text
-                for subxml in xml.sub:
-                    copy_tree(subxml)
+        """
+        Create a complete copy of this XML (sub-)tree.
+
+        The lxml ``Element`` tree is copied at once, and XML instances for
+        the copied sub-trees are only created when first accessed, like for
+        parsed XML. Unless `root` is set, the copy becomes a sub-tree of the
+        XML tree from the current ``with`` context, if any:
 
-            return xml_copy
+        >>> from copy import copy
+        >>> from morexml import XML
 
-        return copy_tree(self, _root=root)
+        >>> with XML['pfx:name'](xmlns={'pfx': 'urn:some:namespace'}) as xml:
+        ...     XML['pfx:sub-name'](attr='value').text = "Some text"
+
+        >>> with XML['copies']() as copies:
+        ...     copy(xml.sub[0])
+        XML[...
+
+        >>> copies.sub[0]
+        XML['pfx:sub-name']:
+        <pfx:sub-name xmlns:pfx="urn:some:namespace" attr="value">Some text</pfx:sub-name>
+
+        >>> copies.sub[0] == xml.sub[0]
+        True
+
+        All namespaces in scope of a copied sub-tree are kept, also if only
+        used by prefixes in texts, like for YANG identities:
+
+        >>> xml = XML(
+        ...     '<if:interfaces xmlns:if="urn:some:interfaces"'
+        ...     ' xmlns:ianaift="urn:some:iana-if-type"><if:interface>'
+        ...     '<if:type>ianaift:ethernetCsmacd</if:type>'
+        ...     '</if:interface></if:interfaces>')
+
+        >>> sorted(copy(xml.sub[0]).xmlns())
+        ['ianaift', 'if']
+        """
+        element = copy_element(self.element)
+        xml = XML._adopt(element, root=root)
+        # copy has same structure ==> same digest
+        xml._digest = self._digest
+        return xml
+
+    def __deepcopy__(self, memo):
+        """Create a complete copy of this XML (sub-)tree as new root."""
+        return self.__copy__(root=True)
+
+    def __reduce__(self):
+        """
+        Pickle this XML (sub-)tree as UTF-8 encoded XML text.
+
+        Together with the :meth:`.digest`, if already computed. No XML
+        instances or ``XML['...']`` classes are pickled. Sub-trees are
+        unpickled as root trees:
+
+        >>> import pickle
+        >>> from morexml import XML
+
+        >>> with XML.NS({'if': 'urn:some:interfaces'}):
+        ...     with XML['if:interfaces']() as xml:
+        ...         XML['if:interface'](name='eth0')
+        XML[...
+
+        >>> pickle.loads(pickle.dumps(xml.sub[0]))
+        XML['if:interface']:
+        <if:interface xmlns:if="urn:some:interfaces" name="eth0"/>
+
+        The ``XML['...']`` classes themselves are pickled by tag, and
+        unpickled from :attr:`morexml.XML.tag_cache`:
+
+        >>> pickle.loads(pickle.dumps(XML['if:interface'])) is type(xml.sub[0])
+        True
+        """
+        return unpickle_xml, (tostring(
+            self.element, encoding='utf-8', xml_declaration=False,
+            with_tail=False), self._digest)
 
     @property
     def parent(self):
@@ -349,14 +1015,27 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
         Or ``None`` if this is not a sub-tree:
 
         >>> xml.parent
+
+        For lazily created sub-trees of parsed XML, the parent is looked up
+        on first access
         """
-        return self._parent
+        parent = self._parent
+        if parent is None or not self.mirror:
+            parent = self._parent = None
+            element = self.element.getparent()
+            if element is not None:
+                parent = XML._wrap(element)
+                if self.mirror:
+                    self._parent = parent
+        return parent
 
     @parent.setter
     def parent(self, parentxml):
         tag = self.element.tag
-        xmlns = dict(parentxml.xmlns()) if parentxml is not None else {}
-        xmlns.update(self.xmlns())
+        xmlns = (
+            dict(parentxml._ns_scope().nsmap) if parentxml is not None
+            else {})
+        xmlns.update(self._ns_scope().nsmap)
 
         if not tag.startswith('{'):
             # check if temporarily stored namespace prefix from instantiation
@@ -371,7 +1050,7 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
                         .format(prefix, ":".join((prefix, tag))))
 
                 self.element.tag = "{{{}}}{}".format(uri, tag)
-            self._prefix = None
+                self._prefix = None
 
         attrs = self._attrs
         if attrs is not None:
@@ -387,11 +1066,19 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
 
                     key = "{{{}}}{}".format(uri, name)
                 self.element.set(key, value)
+            self._attrs = None
 
         if parentxml is not None:
+            self._touch()
+            if self.element.getparent() is not None:
+                type(self).Index.invalidate(self)
             self._parent = parentxml
-            parentxml.sub._list.append(self)
             parentxml.element.append(self.element)
+            # indexed by tag ==> only after resolving in parent's scope
+            self._rescope()
+            parentxml.sub._append(self)
+            type(self).Index.invalidate(parentxml)
+            parentxml._touch()
 
     @property
     def element(self):
@@ -423,9 +1110,9 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
         tag = self.element.tag
         if tag.startswith('{'):  # ==> contains namespace
             namespace, name = tag[1:].split('}')
-            for key, value in dictitems(self.xmlns()):
-                if value == namespace:
-                    return ':'.join((key, name))
+            prefix = self._ns_scope().prefix(namespace)
+            if prefix is not None:
+                return ':'.join((prefix, name))
 
         return tag
 
@@ -443,8 +1130,29 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
 
         >>> list(sorted(xml.sub[0].xmlns().items()))
         [('other', 'urn:other:namespace'), ('pfx', 'urn:some:namespace')]
+
+        The namespace scope is looked up in the lxml tree only once per XML
+        (sub-)tree, and is shared between all trees with identical scope
         """
-        return self.element.nsmap
+        return dict(self._ns_scope().nsmap)
+
+    def _ns_scope(self):
+        """Get the cached :class:`morexml.xmlns.NSScope` of this tree."""
+        scope = self._scope
+        if scope is None:
+            scope = self._scope = NSScope.of(self.element.nsmap)
+        return scope
+
+    def _rescope(self):
+        """Reset the cached namespace scopes of this tree and sub-trees."""
+        self._scope = None
+        element = self.element
+        if len(element):
+            wrappers = self._wrappers
+            for subelement in element.iterdescendants():
+                xml = wrappers.get(subelement)
+                if xml is not None:
+                    xml._scope = None
 
     def __getitem__(self, xmlattr):
         """
@@ -473,6 +1181,32 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
         <name attr="other value"/>
         """
         self.element.attrib[xmlattr] = value
+        type(self).Index.invalidate(self, xmlattr)
+        self._touch()
+
+        parent = self._parent
+        if parent is not None and parent.sub._xmlattr_indexes:
+            # the parent's index for this attribute is outdated now
+            parent.sub._xmlattr_indexes.pop(xmlattr, None)
+
+    def __delitem__(self, xmlattr):
+        """
+        Delete an attribute from this XML (sub-)tree's lxml ``Element``.
+
+        >>> from morexml import XML
+        >>> xml = XML['name'](attr='value', other_attr='other value')
+        >>> del xml['attr']
+        >>> xml
+        XML['name']:
+        <name other-attr="other value"/>
+        """
+        del self.element.attrib[xmlattr]
+        type(self).Index.invalidate(self, xmlattr)
+        self._touch()
+
+        parent = self._parent
+        if parent is not None and parent.sub._xmlattr_indexes:
+            parent.sub._xmlattr_indexes.pop(xmlattr, None)
 
     @property
     def text(self):
@@ -503,19 +1237,73 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
 
     @text.setter
     def text(self, value):
-        self.element.text = unicode(value)
+        self.element.text = unicode(value) if value is not None else None
+        self._touch()
 
     def __iter__(self):
         """Iterate ``(attr, value)`` pairs of this XML tree's ``Element``."""
         return self.element.attrib.iteritems()
 
+    def digest(self):
+        """
+        Get the structural digest of this XML (sub-)tree.
+
+        Covers tag with namespace URI, attributes, text, and the digests of
+        all sub-trees. Namespace prefixes don't matter:
+
+        >>> from morexml import XML
+
+        >>> with XML['pfx:name'](
+        ...         xmlns={'pfx': 'urn:some:namespace'}, attr='value') as xml:
+        ...     XML['sub-name']().text = "Some text"
+
+        >>> other_xml = XML(
+        ...     '<other:name xmlns:other="urn:some:namespace" attr="value">'
+        ...     '<sub-name>Some text</sub-name></other:name>')
+
+        >>> xml.digest() == other_xml.digest()
+        True
+
+        The digests are computed on first access, cached in all existing
+        XML (sub-)tree instances, and invalidated by changes via
+        :meth:`.__setitem__`, :attr:`.text`, and :attr:`.parent`:
+
+        >>> xml.sub[0].text = "Other text"
+        >>> xml.digest() == other_xml.digest()
+        False
+        """
+        digest = self._digest
+        if digest is None:
+            XML._digested = True
+            digest = element_digest(self.element, self._wrappers)
+        return digest
+
+    def _touch(self):
+        """Invalidate the cached digests of this tree and all its parents."""
+        if not XML._digested:
+            return
+
+        self._digest = None
+        wrappers = self._wrappers
+        for element in self.element.iterancestors():
+            xml = wrappers.get(element)
+            if xml is not None:
+                xml._digest = None
+
     def __eq__(self, other):
-        """Check if all this XML tree's data equals `other` tree's data."""
-        return (
-            self.element.tag == other.element.tag and
-            self.element.attrib == other.element.attrib and
-            self.element.nsmap == other.element.nsmap and
-            self.sub == other.sub)
+        """
+        Check if all this XML tree's data equals `other` tree's data.
+
+        Compares the cached digests from :meth:`.digest`
+        """
+        return isinstance(other, XML) and self.digest() == other.digest()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        """Get a hash value based on :meth:`.digest`."""
+        return hash(self.digest())
 
     def __str__(self):
         """Create pretty-printed XML text from this (sub-)tree."""
@@ -524,9 +1312,307 @@ class XML(with_metaclass(XMLMeta, SimpleTree)):
     if PY2:
         __unicode__ = __str__  # pragma: no cover
 
+    def c14n(
+            self, stream=None, exclusive=False, with_comments=False,
+            inclusive_prefixes=None):
+        """
+        Create Canonical XML from this (sub-)tree.
+
+        Unlike :meth:`.__str__`, the result doesn't depend on how the tree
+        was created, which namespace declarations it got where, or in which
+        order its attributes were set:
+
+        >>> from morexml import XML
+
+        >>> with XML.NS({'if': 'urn:some:interfaces'}):
+        ...     with XML['if:interfaces']() as xml:
+        ...         XML['if:interface'](name='eth0', mtu=1500)
+        XML[...
+
+        >>> other_xml = XML(
+        ...     '<if:interfaces xmlns:if="urn:some:interfaces">'
+        ...     '<if:interface mtu="1500" name="eth0"/></if:interfaces>')
+
+        >>> xml.c14n() == other_xml.c14n()
+        True
+
+        With a `stream`, which can be a file object or a file path, the
+        Canonical XML is written to it in chunks, without creating the whole
+        text in memory. Otherwise it's returned as UTF-8 encoded ``bytes``.
+        With `exclusive`, only visibly used namespaces are declared, extended
+        with the optional `inclusive_prefixes`. Comments are left out unless
+        `with_comments` is set
+        """
+        if stream is None:
+            return tostring(
+                self.element, method='c14n', exclusive=exclusive,
+                with_comments=with_comments,
+                inclusive_ns_prefixes=inclusive_prefixes)
+
+        ElementTree(self.element).write_c14n(
+            stream, exclusive=exclusive, with_comments=with_comments,
+            inclusive_ns_prefixes=inclusive_prefixes)
+        return None
+
+    def c14n_digest(
+            self, algorithm='sha256', exclusive=False, with_comments=False,
+            inclusive_prefixes=None):
+        """
+        Hash the Canonical XML of this (sub-)tree with ``hashlib`` `algorithm`.
+
+        The Canonical XML is created like by :meth:`.c14n` and streamed to
+        the hash in chunks, without creating the whole text in memory. Unlike
+        :meth:`.digest`, the result is a standard hash of the XML text, which
+        can also be computed by other tools. Returns the digest ``bytes``
+        """
+        stream = HashStream(new_hash(algorithm))
+        self.c14n(
+            stream, exclusive=exclusive, with_comments=with_comments,
+            inclusive_prefixes=inclusive_prefixes)
+        return stream.hash.digest()
+
+    def index(self, keys=None, xmlns=None):
+        """
+        Create a path-keyed :class:`morexml.XML.Index` of this XML tree.
+
+        The optional `keys` map tag names of list entries to their key
+        attribute names. See :class:`morexml.XML.Index` for more details
+        """
+        return type(self).Index(self, keys=keys, xmlns=xmlns)
+
+    def query(self, xmlns=None):
+        """
+        Start a lazy :class:`morexml.XML.Query` on this XML tree.
+
+        See :class:`morexml.XML.Query` for more details
+        """
+        return type(self).Query((self, ), xmlns=xmlns)
+
+    def diff(self, other, keys=None, xmlns=None):
+        """
+        Create an :class:`morexml.XML.Diff` edit script to `other` XML tree.
+
+        The optional `keys` map tag names of list entries to their key
+        attribute names. See :class:`morexml.XML.Diff` for more details
+        """
+        return type(self).Diff(self, other, keys=keys, xmlns=xmlns)
+
+    def patch(self, diff):
+        """
+        Apply an :class:`morexml.XML.Diff` edit script to this XML tree.
+
+        See :class:`morexml.XML.Diff` for more details
+        """
+        diff.apply(self)
+
+    def template(self):
+        """
+        Compile this XML tree into an :class:`morexml.XML.Template`.
+
+        With :class:`morexml.XML.Slot` placeholders in attribute values and
+        texts as named slots. See :class:`morexml.XML.Template` for details
+        """
+        return type(self).Template(self)
+
+    def graft(self, *trees):
+        """
+        Add root XML `trees` as sub-trees of this XML tree, in given order.
+
+        Like for sub-trees created in the ``with`` context of this tree, the
+        namespace prefixes are resolved and the lxml ``Element`` nodes are
+        moved into this tree's document. See :meth:`.build_parallel`
+        """
+        for xml in trees:
+            if xml.parent is not None:
+                raise ValueError(
+                    "{!r} can only graft root trees, not sub-tree {!r}"
+                    .format(self, xml))
+
+            xml.parent = self
+
+    def build_parallel(
+            self, func, items, workers=None, executor=None, processes=False):
+        """
+        Build sub-trees concurrently, by calling `func` for all `items`.
+
+        Every call must return a new root XML tree, which is then grafted
+        into this tree in order of `items`. The calls run in a pool of
+        `workers` threads, or worker processes if `processes` is set, or in
+        the given ``concurrent.futures`` `executor`. The active
+        :class:`morexml.XML.NS` context is applied in every worker:
+
+        >>> from morexml import XML
+
+        >>> def interface(name):
+        ...     with XML['if:interface'](name=name) as xml:
+        ...         XML['if:mtu']().text = 1500
+        ...     return xml
+
+        >>> with XML.NS({'if': 'urn:some:interfaces'}):
+        ...     xml = XML['if:interfaces']()
+        ...     xml.build_parallel(interface, ['eth0', 'eth1'], workers=2)
+
+        >>> xml
+        XML['if:interfaces']:
+        <if:interfaces xmlns:if="urn:some:interfaces">
+          <if:interface name="eth0">
+            <if:mtu>1500</if:mtu>
+          </if:interface>
+          <if:interface name="eth1">
+            <if:mtu>1500</if:mtu>
+          </if:interface>
+        </if:interfaces>
+
+        Worker processes hand over their trees as serialized XML text, so
+        `func` must be picklable then
+        """
+        if executor is None:
+            if ThreadPoolExecutor is None:  # pragma: no cover
+                raise RuntimeError(
+                    "{!r}.build_parallel() needs concurrent.futures"
+                    .format(self))
+
+            pool = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(
+                max_workers=workers)
+            with pool:
+                return self.build_parallel(
+                    func, items, executor=pool, processes=processes)
+
+        serialize = processes or isinstance(executor, ProcessPoolExecutor)
+        nsmeta = type(type(self).NS)  # pylint: disable=no-member
+        xmlns = dict(nsmeta.context_stack[-1]) if nsmeta.context_stack else {}
+        futures = [
+            executor.submit(build_in_worker, func, xmlns, item, serialize)
+            for item in items]
+
+        for future in futures:
+            xml = future.result()
+            if serialize:
+                xml = XML._wrap(parse_element(xml))
+            self.graft(xml)
+        return None
+
+    def path(self):
+        """
+        Get the absolute :class:`morexml.XML.Path` of this XML (sub-)tree.
+
+        Sub-trees with equally tagged siblings get a numerical index:
+
+        >>> from morexml import XML
+
+        >>> with XML['interfaces']() as xml:
+        ...     XML['interface']()
+        ...     XML['interface']().text = "eth1"
+        XML[...
+
+        >>> xml.sub[1].path()
+        XML.Path: /interfaces/interface[1]
+        """
+        element = self.element
+        xmlns = {
+            prefix: uri for prefix, uri in self._ns_scope().nsmap.items()
+            if prefix is not None}
+        path = type(self).Path(xmlns=xmlns)
+        for node in reversed([element] + list(element.iterancestors())):
+            tag = node.tag
+            prefix = node.prefix
+            if prefix is not None:
+                tag = ':'.join((prefix, tag.rsplit('}', 1)[-1]))
+            path = path / tag
+            if node.getparent() is not None:
+                index = sum(1 for _ in node.itersiblings(
+                    node.tag, preceding=True))
+                if index or next(
+                        node.itersiblings(node.tag), None) is not None:
+                    path = path[index]
+        return path
+
+    def validate(self, schema):
+        """
+        Validate this XML tree with an :class:`morexml.XML.Schema`.
+
+        Which can also be given as file path, for using
+        :meth:`morexml.XML.Schema.load`. Returns a ``list`` of all
+        violations, which is empty if this tree is valid
+        """
+        if isinstance(schema, string_types):
+            schema = type(self).Schema.load(schema)
+        return schema.validate(self)
+
+    def transform(self, stylesheet, **params):
+        """
+        Transform this XML tree with an XSLT `stylesheet` and XSLT `params`.
+
+        The `stylesheet` can be given as :class:`morexml.XML.Stylesheet`, XML
+        tree, or file path, and is only compiled once. Returns the result as
+        new XML tree. See :class:`morexml.XML.Stylesheet` for details
+        """
+        return type(self).Stylesheet.get(stylesheet).transform(self, **params)
+
     def to_root(self):
         return self.__copy__(root=True)
 
+    def __enter__(self):
+        """
+        Put this XML tree on top of the implicit parent context stack.
+
+        The stack is separate per thread and ``asyncio`` task, so XML trees
+        can be created concurrently
+        """
+        stack = type(type(self)).context_stack
+        assert self not in stack, (
+            "Attempt to put same instance twice into .context_stack of {!r}"
+            .format(type(type(self))))
+
+        stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Pop this XML tree from the implicit parent context stack."""
+        stack = type(type(self)).context_stack
+        assert stack and stack[-1] is self, (
+            "Corrupted .context_stack of {!r}".format(type(type(self))))
+
+        stack.pop(-1)
+        if exc_info[0] is not None:
+            reraise(*exc_info)
+
     def __repr__(self):
         """Create an XML text representation from this (sub-)tree."""
         return "{}:\n{}".format(qualname(type(self)), self)
+
+
+class LazySub(object):
+    """
+    Descriptor for the :attr:`morexml.XML.sub` containers.
+
+    Creates the container of an XML tree on first access. Class access gives
+    the container class
+    """
+
+    def __init__(self, subcls):
+        self.subcls = subcls
+
+    def __get__(self, xml, cls=None):
+        if xml is None:
+            return self.subcls
+
+        sub = xml._sub  # pylint: disable=protected-access
+        if sub is None:
+            sub = xml._sub = self.subcls(owner=xml)
+        return sub
+
+    def __set__(self, xml, sub):
+        xml._sub = sub  # pylint: disable=protected-access
+
+
+XML.sub = LazySub(XML.sub)
+
+# keep doctests of the container class discoverable behind the descriptor
+__test__ = {'XML.sub': XML.sub}
+
+# API: replace the process-wide implicit parent stack from SimpleTreeMeta
+type(XML).context_stack = ContextStack('morexml.XML')
+
+# pickle factory classes by tag instead of by (non-existing) global name
+copyreg.pickle(type(XML), reduce_xml_class)
@@ -0,0 +1,224 @@
+# moreXML >>> eXcitinglyMORE pythonicity on top of LXML's efficiency
+#
+# Copyright (C) 2019 ADVA Optical Networking SE
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Define the bulk tree :class:`morexml.XML.Builder`."""
+
+from __future__ import absolute_import
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover  # Python 2
+    from collections import Mapping
+
+import zetup
+from lxml.etree import SubElement  # pylint: disable=no-name-in-module
+from moretools import qualname
+from six import string_types, text_type as unicode
+
+import morexml
+from .meta import XMLMeta
+from .xml import XML
+from .xmlelement import make_element
+from .xmlpath import clark_name
+
+__all__ = ('Builder', )
+
+
+class Builder(zetup.object):
+    """
+    Creates whole XML trees from nested Python data in one pass.
+
+    Used by :meth:`morexml.XML.build` and :meth:`morexml.XML.from_records`.
+    The namespace context is resolved once per builder, and every tag and
+    attribute name only once per builder. The lxml ``Element`` tree is
+    directly created, and :class:`morexml.XML` instances for its sub-trees
+    are only created when first accessed, like for parsed XML.
+
+    A tree is specified as ``(tag, attrs, content)`` tuple, with optional
+    ``attrs`` mapping and ``content``, which is either a text, a scalar value
+    converted to text, an iterable of sub-tree specifications, or a mapping
+    of sub-tree tags to their content:
+
+    >>> from morexml import XML
+
+    >>> with XML.NS({'if': 'urn:some:interfaces'}):
+    ...     xml = XML.build(('if:interfaces', None, (
+    ...         ('if:interface', {'name': 'eth0'}, (
+    ...             ('if:mtu', None, '1500'), )),
+    ...         ('if:interface', {'name': 'eth1'}), )))
+
+    >>> xml
+    XML['if:interfaces']:
+    <if:interfaces xmlns:if="urn:some:interfaces">
+      <if:interface name="eth0">
+        <if:mtu>1500</if:mtu>
+      </if:interface>
+      <if:interface name="eth1"/>
+    </if:interfaces>
+
+    Numbers and other scalar values are converted to text, like by the
+    :attr:`morexml.XML.text` setter, and ``bytes`` are decoded as UTF-8:
+
+    >>> XML.build(('if:interface', None, (
+    ...     ('if:mtu', None, 1500), ('if:name', None, b'eth0'))),
+    ...     xmlns={'if': 'urn:some:interfaces'})
+    XML['if:interface']:
+    <if:interface xmlns:if="urn:some:interfaces">
+      <if:mtu>1500</if:mtu>
+      <if:name>eth0</if:name>
+    </if:interface>
+
+    Mappings are for nested data without attributes, like from JSON. Every
+    key becomes a sub-tree tag, and ``list`` values create one sub-tree per
+    item:
+
+    >>> XML.build(('if:interfaces', None, {'if:interface': [
+    ...     {'if:name': 'eth0', 'if:mtu': 1500}, {'if:name': 'eth1'}]}),
+    ...     xmlns={'if': 'urn:some:interfaces'})
+    XML['if:interfaces']:
+    <if:interfaces xmlns:if="urn:some:interfaces">
+      <if:interface>
+        <if:name>eth0</if:name>
+        <if:mtu>1500</if:mtu>
+      </if:interface>
+      <if:interface>
+        <if:name>eth1</if:name>
+      </if:interface>
+    </if:interfaces>
+
+    Attribute names are used as given, like in the ``attrs`` argument of
+    the factory classes, and values are converted to text. Attributes with
+    ``None`` value are left out. For flat lists, see
+    :meth:`morexml.XML.from_records`
+    """
+
+    # used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested class morexml.XML.Builder
+    __qualname__ = "XML.Builder"
+
+    def __init__(self, xmlns=None):
+        """
+        Create a builder for the active :class:`morexml.XML.NS` context.
+
+        Optionally extended with the `xmlns` mapping
+        """
+        nsmeta = type(XML.NS)  # pylint: disable=no-member
+        nsctx = dict(nsmeta.context_stack[-1]) if nsmeta.context_stack else {}
+        if xmlns is not None:
+            nsctx.update(xmlns)
+        self._xmlns = nsctx
+        self._tags = {}
+        self._xmlattrs = {}
+
+    def _tag(self, tag):
+        """Get the ``{URI}name`` of a `tag`, resolved only once."""
+        try:
+            return self._tags[tag]
+        except KeyError:
+            name = self._tags[tag] = clark_name(tag, self._xmlns)
+            return name
+
+    def _xmlattr(self, name):
+        """Get the ``{URI}name`` of an attribute `name`, resolved once."""
+        xmlattr = self._xmlattrs[name] = clark_name(
+            name, self._xmlns, kind='attribute')
+        return xmlattr
+
+    def _attrib(self, attrs):
+        """Create an lxml attribute ``dict`` from an `attrs` mapping."""
+        if not attrs:
+            return {}
+
+        get = self._xmlattrs.get
+        return {
+            get(key) or self._xmlattr(key):
+            value if isinstance(value, string_types) else unicode(value)
+            for key, value in attrs.items() if value is not None}
+
+    def _content(self, element, content):
+        """Add text or sub-trees from `content` to lxml `element`."""
+        if content is None:
+            return
+
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        if isinstance(content, string_types):
+            element.text = content
+            return
+
+        if isinstance(content, Mapping):
+            self._mapping(element, content)
+            return
+
+        try:
+            specs = iter(content)
+        except TypeError:  # ==> scalar value like from records
+            element.text = unicode(content)
+            return
+
+        tag = self._tag
+        attrib = self._attrib
+        for spec in specs:
+            length = len(spec)
+            child = SubElement(
+                element, tag(spec[0]),
+                attrib(spec[1]) if length > 1 else {})
+            if length > 2:
+                self._content(child, spec[2])
+
+    def _mapping(self, element, content):
+        """Add sub-trees from a ``{tag: content}`` mapping to `element`."""
+        tag = self._tag
+        for key, value in content.items():
+            for item in value if isinstance(value, list) else (value, ):
+                self._content(SubElement(element, tag(key)), item)
+
+    def _root(self, tag, attrs=None):
+        """Create the root lxml ``Element`` with all context namespaces."""
+        return make_element(
+            self._tag(tag), self._attrib(attrs), nsmap=self._xmlns or None)
+
+    def build(self, spec):
+        """Create the lxml ``Element`` tree from a tree `spec` tuple."""
+        length = len(spec)
+        element = self._root(spec[0], spec[1] if length > 1 else None)
+        if length > 2:
+            self._content(element, spec[2])
+        return element
+
+    def records(self, tag, entrytag, records, attrs=None):
+        """
+        Create an lxml ``Element`` tree of a flat list.
+
+        With the root `tag` and optional `attrs`, and an `entrytag` entry
+        for every attribute mapping in `records`
+        """
+        element = self._root(tag, attrs)
+        entrytag = self._tag(entrytag)
+        attrib = self._attrib
+        for record in records:
+            SubElement(element, entrytag, attrib(record))
+        return element
+
+    def __repr__(self):
+        """Create a representation with the resolved namespace context."""
+        return "{}({!r})".format(qualname(type(self)), self._xmlns)
+
+
+# API: expose Builder as nested class morexml.XML.Builder
+XMLMeta.Builder = Builder
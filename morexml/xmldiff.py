@@ -0,0 +1,296 @@
+# moreXML >>> eXcitinglyMORE pythonicity on top of LXML's efficiency
+#
+# Copyright (C) 2019 ADVA Optical Networking SE
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Define the tree edit script :class:`morexml.XML.Diff`."""
+
+from __future__ import absolute_import
+
+from bisect import bisect_left
+from collections import namedtuple
+from copy import deepcopy
+
+import zetup
+from lxml.etree import Element  # pylint: disable=no-name-in-module
+from moretools import qualname
+from six import string_types
+
+import morexml
+from .meta import XMLMeta
+from .xml import XML, element_digest
+from .xmlpath import clark_name
+
+__all__ = ('Diff', 'Edit')
+
+
+#: A single operation of an edit script.
+#:
+#: The `path` is the tuple of sub-tree indexes leading from the root to the
+#: target, valid at the time the operation is applied. The `name` is only
+#: used by ``'attribute'`` operations, and `value` holds the new attribute
+#: value, text, or :class:`morexml.XML` sub-tree
+Edit = namedtuple('Edit', ('action', 'path', 'name', 'value'))
+
+
+def stable_positions(positions):
+    """
+    Get the longest increasing subsequence of distinct `positions` as set.
+
+    >>> sorted(stable_positions([0, 3, 1, 2, 5, 4]))
+    [0, 1, 2, 4]
+    """
+    tails = []
+    tail_indexes = []
+    previous = [None] * len(positions)
+    for index, position in enumerate(positions):
+        length = bisect_left(tails, position)
+        if length == len(tails):
+            tails.append(position)
+            tail_indexes.append(index)
+        else:
+            tails[length] = position
+            tail_indexes[length] = index
+        previous[index] = tail_indexes[length - 1] if length else None
+
+    stable = set()
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        stable.add(positions[index])
+        index = previous[index]
+    return stable
+
+
+class Diff(zetup.object):
+    """
+    An edit script that turns one :class:`morexml.XML` tree into another.
+
+    Created via :meth:`morexml.XML.diff`. Sub-trees with equal digests (see
+    :meth:`morexml.XML.digest`) are skipped without looking into them. List
+    entries are matched by tag and the key attributes given in `keys`, and
+    all other sub-trees by tag and position among equally tagged siblings:
+
+    >>> from morexml import XML
+
+    >>> with XML['interfaces']() as running:
+    ...     XML['interface'](name='eth0', mtu='1500')
+    ...     XML['interface'](name='eth1', mtu='1500')
+    XML[...
+
+    >>> with XML['interfaces']() as intended:
+    ...     XML['interface'](name='eth1', mtu='9000')
+    ...     XML['interface'](name='eth2', mtu='1500')
+    XML[...
+
+    >>> diff = running.diff(intended, keys={'interface': 'name'})
+    >>> for edit in diff:
+    ...     print(edit.action, edit.path, edit.name, edit.value)
+    delete (0,) None None
+    attribute (0,) mtu 9000
+    insert (1,) None <interface name="eth2" mtu="1500"/>
+
+    :meth:`morexml.XML.patch` applies an edit script:
+
+    >>> running.patch(diff)
+    >>> running == intended
+    True
+
+    Digests already cached by comparisons are reused, also for diffs:
+
+    >>> running == intended
+    True
+    >>> len(running.diff(intended))
+    0
+    >>> intended.sub[0]['mtu'] = '1500'
+    >>> running == intended
+    False
+    >>> len(running.diff(intended))
+    1
+    """
+
+    # used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested class morexml.XML.Diff
+    __qualname__ = "XML.Diff"
+
+    #: The single operation type of edit scripts.
+    Edit = Edit
+
+    def __init__(self, xml, other, keys=None, xmlns=None):
+        """
+        Compute the edit script from `xml` to `other` XML tree.
+
+        Prefixes in `keys` are resolved using the optional `xmlns` mapping
+        and the active :class:`morexml.XML.NS` context
+        """
+        nsmeta = type(XML.NS)  # pylint: disable=no-member
+        nsctx = dict(nsmeta.context_stack[-1]) if nsmeta.context_stack else {}
+        if xmlns is not None:
+            nsctx.update(xmlns)
+
+        self._keys = {}
+        for tag, attrs in (keys or {}).items():
+            if isinstance(attrs, string_types):
+                attrs = (attrs, )
+            self._keys[clark_name(tag, nsctx)] = tuple(
+                clark_name(attr, nsctx, kind='attribute') for attr in attrs)
+
+        self._edits = []
+        self._digests = {}
+        XML._digested = True  # pylint: disable=protected-access
+        wrappers = XML._wrappers  # pylint: disable=protected-access
+        element_digest(xml.element, wrappers, self._digests)
+        element_digest(other.element, wrappers, self._digests)
+
+        if xml.element.tag != other.element.tag:
+            self._edits.append(Edit('replace', (), None, other))
+        else:
+            self._compare(xml.element, other.element, ())
+        del self._digests
+
+    def _match_keys(self, elements):
+        """Create a unique matching key for every lxml sibling element."""
+        keys = self._keys
+        counts = {}
+        result = []
+        for element in elements:
+            tag = element.tag
+            key = (tag, tuple(
+                element.get(attr) for attr in keys.get(tag, ())))
+            count = counts[key] = counts.get(key, -1) + 1
+            result.append(key + (count, ))
+        return result
+
+    def _digest(self, element):
+        """
+        Get the digest of lxml `element`.
+
+        Sub-trees with digests cached in their XML instances aren't walked
+        by :func:`morexml.xml.element_digest`. So the digests of their
+        sub-elements are computed on demand
+        """
+        digest = self._digests.get(element)
+        if digest is None:
+            digest = element_digest(
+                element, XML._wrappers,  # pylint: disable=protected-access
+                self._digests)
+        return digest
+
+    def _compare(self, old, new, path):
+        """Add the edit operations needed to turn lxml `old` into `new`."""
+        if self._digest(old) == self._digest(new):
+            return
+
+        edits = self._edits
+        old_attrib = dict(old.items())
+        for name, value in new.items():
+            if old_attrib.pop(name, None) != value:
+                edits.append(Edit('attribute', path, name, value))
+        for name in old_attrib:
+            edits.append(Edit('attribute', path, name, None))
+
+        if old.text != new.text:
+            edits.append(Edit('text', path, None, new.text))
+
+        old_children = list(old.iterchildren(Element))
+        new_children = list(new.iterchildren(Element))
+        old_positions = {
+            key: position for position, key in enumerate(
+                self._match_keys(old_children))}
+        matches = [
+            old_positions.get(key)
+            for key in self._match_keys(new_children)]
+
+        # matched sub-trees in unchanged order are compared recursively,
+        # and all others are deleted and (re-)inserted
+        stable = stable_positions([
+            position for position in matches if position is not None])
+        for position in range(len(old_children) - 1, -1, -1):
+            if position not in stable:
+                edits.append(Edit('delete', path + (position, ), None, None))
+
+        wrap = XML._wrap  # pylint: disable=protected-access
+        for position, (old_position, child) in enumerate(
+                zip(matches, new_children)):
+            if old_position in stable:
+                self._compare(
+                    old_children[old_position], child, path + (position, ))
+            else:
+                edits.append(
+                    Edit('insert', path + (position, ), None, wrap(child)))
+
+    def apply(self, xml):
+        """Apply all edit operations to `xml` tree, in place."""
+        wrap = XML._wrap  # pylint: disable=protected-access
+        for edit in self._edits:
+            action, path = edit.action, edit.path
+            if action == 'replace' and not path:
+                self._replace_root(xml, edit.value)
+                continue
+
+            target = xml
+            for position in path[:-1]:
+                target = target.sub[position]
+
+            if action in ('insert', 'delete', 'replace'):
+                if action != 'insert':
+                    target.sub._pop(path[-1])
+                if action != 'delete':
+                    target.sub._insert(
+                        path[-1], wrap(deepcopy(edit.value.element)))
+                continue
+
+            if path:
+                target = target.sub[path[-1]]
+            if action == 'attribute':
+                if edit.value is None:
+                    del target[edit.name]
+                else:
+                    target[edit.name] = edit.value
+            elif action == 'text':
+                target.text = edit.value
+
+    @staticmethod
+    def _replace_root(xml, other):
+        """Replace all data of root `xml` tree in place with `other` data."""
+        element = xml.element
+        tail = element.tail
+        element.clear()
+        element.tail = tail
+        element.tag = other.element.tag
+        for name, value in other.element.items():
+            element.set(name, value)
+        element.text = other.element.text
+        for child in other.element.iterchildren(Element):
+            element.append(deepcopy(child))
+
+        xml.sub._items = None
+        xml.sub._changed()
+
+    def __iter__(self):
+        """Iterate the edit operations in order of application."""
+        return iter(self._edits)
+
+    def __len__(self):
+        """Get the number of edit operations."""
+        return len(self._edits)
+
+    def __repr__(self):
+        """Create a representation with the number of operations."""
+        return "{}: {} edit(s)".format(qualname(type(self)), len(self))
+
+
+# API: expose Diff as nested class morexml.XML.Diff
+XMLMeta.Diff = Diff
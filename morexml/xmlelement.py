@@ -0,0 +1,105 @@
+# moreXML >>> eXcitinglyMORE pythonicity on top of LXML's efficiency
+#
+# Copyright (C) 2019 ADVA Optical Networking SE
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Define the custom lxml element class of all :class:`morexml.XML` trees."""
+
+from __future__ import absolute_import
+
+from copy import deepcopy
+from threading import local
+
+from lxml.etree import (  # pylint: disable=no-name-in-module
+    ElementBase, ElementDefaultClassLookup, XMLParser, fromstring)
+
+import morexml
+
+__all__ = (
+    'XMLElement', 'copy_element', 'make_element', 'make_parser',
+    'parse_element')
+
+
+class XMLElement(ElementBase):
+    """
+    The lxml element class of all lxml trees created by :mod:`morexml`.
+
+    Gives direct access from any lxml node, like from XPath results, to its
+    :class:`morexml.XML` proxy, which is created on demand:
+
+    >>> from morexml import XML
+
+    >>> xml = XML('<name><sub-name/></name>')
+    >>> element = xml.element.xpath('sub-name')[0]
+    >>> element.xml is xml.sub[0]
+    True
+
+    Like all lxml custom element classes, it holds no Python state. The
+    :class:`morexml.XML` proxies are kept in the ``XML._wrappers`` registry
+    """
+
+    @property
+    def xml(self):
+        """Get the :class:`morexml.XML` proxy of this lxml node."""
+        return morexml.XML._wrap(self)  # pylint: disable=protected-access
+
+
+#: The lxml element class lookup used for all :mod:`morexml` lxml trees.
+LOOKUP = ElementDefaultClassLookup(element=XMLElement)
+
+# lxml parsers must not be shared between threads
+_local = local()
+
+
+def make_parser(**options):
+    """Create an lxml ``XMLParser`` with `options`, using :data:`LOOKUP`."""
+    parser = XMLParser(**options)
+    parser.set_element_class_lookup(LOOKUP)
+    return parser
+
+
+def make_element(tag, attrib=None, nsmap=None):
+    """Create a new root lxml :class:`.XMLElement` node."""
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = make_parser(remove_blank_text=True)
+    return parser.makeelement(tag, attrib, nsmap)
+
+
+def parse_element(xmltext):
+    """
+    Parse an lxml :class:`.XMLElement` tree from UTF-8 encoded `xmltext`.
+
+    Blank texts are kept, so that XML text created by lxml from an existing
+    tree gives exactly the same tree again
+    """
+    parser = getattr(_local, 'exact_parser', None)
+    if parser is None:
+        parser = _local.exact_parser = make_parser(huge_tree=True)
+    return fromstring(xmltext, parser)
+
+
+def copy_element(element):
+    """
+    Copy lxml `element` with all its sub-elements as new root tree.
+
+    Unlike a plain ``deepcopy``, the copy declares all namespaces in scope
+    of `element`, also those only declared by its ancestors, which can be
+    used by prefixes in texts and attribute values
+    """
+    root = make_element(element.tag, element.attrib, element.nsmap)
+    root.text = element.text
+    for child in element:
+        root.append(deepcopy(child))
+    return root
@@ -0,0 +1,234 @@
+# moreXML >>> eXcitinglyMORE pythonicity on top of LXML's efficiency
+#
+# Copyright (C) 2019 ADVA Optical Networking SE
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Define the path-keyed :class:`morexml.XML.Index`."""
+
+from __future__ import absolute_import
+
+from collections import deque
+from weakref import WeakSet
+
+import zetup
+from lxml.etree import Element  # pylint: disable=no-name-in-module
+from moretools import qualname
+from six import string_types
+
+import morexml
+from .meta import XMLMeta
+from .xmlpath import Root, Tagged, clark_name
+
+__all__ = ('Index', )
+
+#: The key attributes of sub-trees without any.
+NO_KEYS = frozenset()
+
+
+class Index(zetup.object):
+    """
+    A hash index of all sub-trees of an XML tree by their paths.
+
+    Built in one traversal of the lxml ``Element`` tree. Afterwards, every
+    lookup by :class:`morexml.XML.Path` only takes a ``dict`` access. The
+    identity of list entries is given by `keys`, a mapping of tag names to
+    key attribute names:
+
+    >>> from morexml import XML
+
+    >>> with XML['interfaces']() as xml:
+    ...     with XML['interface'](name='eth0'):
+    ...         XML['state'](oper_status='up')
+    ...     with XML['interface'](name='eth1'):
+    ...         XML['state'](oper_status='down')
+    XML[...
+
+    >>> index = xml.index(keys={'interface': 'name'})
+
+    >>> path = XML.Path() / 'interfaces' / 'interface'
+    >>> index.find(path[{'name': 'eth1'}] / 'state')
+    XML['state']:
+    <state oper-status="down"/>
+
+    Paths with segments that can't be looked up directly, like ``//``,
+    ``*``, numerical indexes, or attribute filters that differ from the key
+    attributes, are evaluated via :meth:`morexml.XML.Path.findall`:
+
+    >>> index.findall(path)
+    XML.List: ['interface', 'interface']
+
+    The index is automatically rebuilt on next lookup after sub-trees were
+    added to the indexed tree, or after key attributes were changed:
+
+    >>> xml.sub[1]['name'] = 'eth2'
+    >>> index.find(path[{'name': 'eth1'}] / 'state')
+    >>> index.find(path[{'name': 'eth2'}] / 'state')
+    XML['state']:
+    <state oper-status="down"/>
+    """
+
+    # used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested class morexml.XML.Index
+    __qualname__ = "XML.Index"
+
+    #: All existing indexes, checked by :meth:`.invalidate`.
+    _live = WeakSet()
+
+    #: The ``{URI}name`` key attribute names per ``{URI}name`` tag.
+    _keys = None
+
+    #: The lists of lxml ``Element`` nodes per path key.
+    #:
+    #: Reset to ``None`` when the indexed tree changes
+    _entries = None
+
+    def __init__(self, xml, keys=None, xmlns=None):
+        """
+        Index the sub-trees of `xml` with optional list entry `keys`.
+
+        Prefixes in `keys` are resolved using the optional `xmlns` mapping
+        and the active :class:`morexml.XML.NS` context
+        """
+        nsmeta = type(type(xml).NS)
+        nsctx = dict(nsmeta.context_stack[-1]) if nsmeta.context_stack else {}
+        if xmlns is not None:
+            nsctx.update(xmlns)
+
+        self._xml = xml
+        self._keys = {}
+        for tag, attrs in (keys or {}).items():
+            if isinstance(attrs, string_types):
+                attrs = (attrs, )
+            self._keys[clark_name(tag, nsctx)] = frozenset(
+                clark_name(attr, nsctx, kind='attribute') for attr in attrs)
+
+        self._key_attrs = frozenset().union(*self._keys.values())
+        type(self)._live.add(self)
+
+    @classmethod
+    def invalidate(cls, xml, xmlattr=None):
+        """
+        Invalidate all indexes of trees containing the `xml` sub-tree.
+
+        If an `xmlattr` name is given, only indexes using it as key attribute
+        are invalidated
+        """
+        live = cls._live
+        if not live:
+            return
+
+        element = xml.element
+        ancestors = set(element.iterancestors())
+        ancestors.add(element)
+        for index in list(live):
+            if index._xml.element in ancestors and (
+                    xmlattr is None or xmlattr in index._key_attrs):
+                index._entries = None
+
+    def _step(self, element):
+        """Create the index key step of an lxml `element`."""
+        tag = element.tag
+        keys = self._keys.get(tag)
+        if not keys:
+            return (tag, NO_KEYS)
+
+        get = element.get
+        return (tag, frozenset(
+            (attr, get(attr)) for attr in keys if get(attr) is not None))
+
+    def _build(self):
+        """Create the path key entries in one breadth-first traversal."""
+        entries = {}
+        step = self._step
+        root = self._xml.element
+        queue = deque([(root, (step(root), ))])
+        while queue:
+            element, key = queue.popleft()
+            entries.setdefault(key, []).append(element)
+            for child in element.iterchildren(Element):
+                queue.append((child, key + (step(child), )))
+
+        self._entries = entries
+        return entries
+
+    def _key(self, path):
+        """
+        Create the index key of `path`.
+
+        Or ``None`` if `path` can't be looked up directly
+        """
+        segments = path._segments  # pylint: disable=protected-access
+        if isinstance(segments[0], Root):
+            if self._xml.element.getparent() is not None:
+                return None
+
+            key = ()
+            segments = segments[1:]
+        else:
+            key = (self._step(self._xml.element), )
+
+        for seg in segments:
+            if not isinstance(seg, Tagged) or seg.index is not None:
+                return None
+
+            tag = seg._clark_tag  # pylint: disable=protected-access
+            xmlattrs = frozenset(
+                seg._clark_xmlattrs)  # pylint: disable=protected-access
+            if frozenset(name for name, _ in xmlattrs) != self._keys.get(
+                    tag, NO_KEYS):
+                return None
+
+            key += ((tag, xmlattrs), )
+        return key
+
+    def findall(self, path):
+        """
+        Get a :class:`morexml.XML.List` of all sub-trees matching `path`.
+
+        Relative paths start below the indexed XML tree, like in
+        :meth:`morexml.XML.Path.findall`
+        """
+        xml = self._xml
+        key = self._key(path)
+        if key is None:
+            return path.findall(xml)
+
+        entries = self._entries
+        if entries is None:
+            entries = self._build()
+
+        wrap = xml._wrap  # pylint: disable=protected-access
+        return type(xml).List(
+            wrap(element) for element in entries.get(key, ()))
+
+    def find(self, path):
+        """
+        Get the first sub-tree matching `path`.
+
+        Or ``None`` if nothing matches
+        """
+        for found in self.findall(path):
+            return found
+
+        return None
+
+    def __repr__(self):
+        """Create a representation with the indexed tree's tag name."""
+        return "{} of {!r}".format(qualname(type(self)), self._xml.tag)
+
+
+# API: expose Index as nested class morexml.XML.Index
+XMLMeta.Index = Index
@@ -19,14 +19,40 @@
 from __future__ import absolute_import
 
 import zetup
+from lxml.etree import tostring  # pylint: disable=no-name-in-module
 from moretools import isinteger, qualname
+from six import string_types
 
 import morexml
 from .meta import XMLMeta
+from .xmlelement import parse_element
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 __all__ = ('List', )
 
 
+def unpickle_list(xmltexts, locations):
+    """
+    Recreate a pickled :class:`morexml.XML.List`.
+
+    From the XML text ``bytes`` of all top-level trees, and the
+    ``(tree number, child index path)`` location of every item
+    """
+    wrap = morexml.XML._wrap  # pylint: disable=protected-access
+    roots = [parse_element(xmltext) for xmltext in xmltexts]
+    items = []
+    for number, path in locations:
+        element = roots[number]
+        for index in path:
+            element = element[index]
+        items.append(wrap(element))
+    return List(items)
+
+
 class List(zetup.object):
     """
     An ordered collection of :class:`morexml.XML` (sub-)trees.
@@ -110,6 +136,248 @@ class List(zetup.object):
         for xml in self:
             xml[key] = value
 
+    def columns(self, xmlattrs, dtype=None, default=None, asarray=False):
+        """
+        Extract the values of several XML attributes from all (sub-)trees.
+
+        Returns a ``dict`` with a value ``list`` per attribute name in
+        `xmlattrs`. Missing attributes get the `default` value instead of
+        raising a ``KeyError``:
+
+        >>> from morexml import XML
+        >>> xmllist = XML.List([
+        ...     XML['counter'](name='in', value='10'),
+        ...     XML['counter'](name='out', value='20'),
+        ...     XML['counter'](name='drop'),
+        ... ])
+
+        >>> columns = xmllist.columns(['name', 'value'])
+        >>> columns['name']
+        ['in', 'out', 'drop']
+        >>> columns['value']
+        ['10', '20', None]
+
+        All values except missing ones are converted with the optional
+        `dtype`:
+
+        >>> xmllist.columns('value', dtype=int, default=0)['value']
+        [10, 20, 0]
+
+        With ``asarray=True``, NumPy arrays are created instead of lists,
+        and `dtype` can be any NumPy ``dtype`` specification. Numeric arrays
+        are filled in one pass by ``numpy.fromiter``, which also parses the
+        values. For all but ``object`` dtypes, missing attributes raise a
+        ``ValueError`` if no `default` is given
+        """
+        if isinstance(xmlattrs, string_types):
+            xmlattrs = (xmlattrs, )
+        if asarray and numpy is None:
+            raise ImportError(
+                "NumPy is required for {!r}.columns(..., asarray=True)"
+                .format(type(self)))
+
+        # get the bound lxml Element.get methods once for all columns
+        getters = [xml.element.get for xml in self._list]
+        convert = dtype
+        if asarray and dtype is not None:
+            convert = numpy.dtype(dtype).type
+
+        columns = {}
+        for xmlattr in xmlattrs:
+            if asarray and dtype is not None:
+                columns[xmlattr] = self._array(
+                    getters, xmlattr, numpy.dtype(dtype), default)
+                continue
+
+            column = [get(xmlattr) for get in getters]
+            if convert is not None:
+                column = [
+                    convert(value) if value is not None else default
+                    for value in column]
+            elif default is not None:
+                column = [
+                    value if value is not None else default
+                    for value in column]
+            if asarray:
+                column = numpy.array(column)
+            columns[xmlattr] = column
+        return columns
+
+    def _array(self, getters, xmlattr, dtype, default):
+        """
+        Create a NumPy array of `xmlattr` values with NumPy `dtype`.
+
+        From the bound lxml ``Element.get`` methods in `getters`
+        """
+        if dtype.kind in 'iufc':
+            try:
+                return numpy.fromiter(
+                    (get(xmlattr, default) for get in getters), dtype,
+                    count=len(getters))
+
+            except (TypeError, ValueError):
+                self._check_missing(getters, xmlattr, dtype, default)
+                raise
+
+        if dtype.kind != 'O':
+            self._check_missing(getters, xmlattr, dtype, default)
+        convert = dtype.type
+        return numpy.array([
+            convert(value) if value is not None else default
+            for value in (get(xmlattr) for get in getters)], dtype=dtype)
+
+    def _check_missing(self, getters, xmlattr, dtype, default):
+        """Raise ``ValueError`` if `xmlattr` is missing without `default`."""
+        if default is None and any(
+                get(xmlattr) is None for get in getters):
+            raise ValueError(
+                "Missing XML attribute {!r} in {} items needs a non-None "
+                "default for dtype {!r}".format(
+                    xmlattr, qualname(type(self)), str(dtype)))
+
+    def unique(self):
+        """
+        Create another :class:`XML.List` without duplicate (sub-)trees.
+
+        Keeps the first of all equal (sub-)trees, using their cached digests:
+
+        >>> from morexml import XML
+        >>> xmllist = XML.List([
+        ...     XML['name'](attr='value'),
+        ...     XML['name'](attr='other value'),
+        ...     XML['name'](attr='value'),
+        ... ])
+
+        >>> xmllist.unique()['attr']
+        ('value', 'other value')
+        """
+        seen = set()
+        items = []
+        for xml in self:
+            digest = xml.digest()
+            if digest not in seen:
+                seen.add(digest)
+                items.append(xml)
+        return type(self)(items)
+
+    def duplicates(self):
+        """
+        Create another :class:`XML.List` with all repeated (sub-)trees.
+
+        Contains every (sub-)tree equal to an earlier one:
+
+        >>> from morexml import XML
+        >>> xmllist = XML.List([
+        ...     XML['name'](attr='value'),
+        ...     XML['name'](attr='other value'),
+        ...     XML['name'](attr='value'),
+        ... ])
+
+        >>> xmllist.duplicates()
+        XML.List: ['name']
+        """
+        seen = set()
+        items = []
+        for xml in self:
+            digest = xml.digest()
+            if digest in seen:
+                items.append(xml)
+            else:
+                seen.add(digest)
+        return type(self)(items)
+
+    def query(self, xmlns=None):
+        """
+        Start a lazy :class:`morexml.XML.Query` on all contained trees.
+
+        >>> from morexml import XML
+        >>> xmllist = XML.List([
+        ...     XML['name'](attr='value'),
+        ...     XML['name'](attr='other value'),
+        ... ])
+
+        >>> xmllist.query().where(attr='value').list()
+        XML.List: ['name']
+        """
+        return XMLMeta.Query(self._list, xmlns=xmlns)
+
+    def validate(self, schema):
+        """
+        Validate all contained XML trees with one :class:`morexml.XML.Schema`.
+
+        Which can also be given as file path. Returns a ``list`` with the
+        ``list`` of violations for every XML tree
+        """
+        if isinstance(schema, string_types):
+            schema = XMLMeta.Schema.load(schema)  # pylint: disable=no-member
+        return schema.validate_all(self)
+
+    def transform(self, stylesheet, **params):
+        """
+        Transform all contained XML trees with one XSLT `stylesheet`.
+
+        Which is compiled only once, and can also be given as XML tree or
+        file path. Returns an :class:`morexml.XML.List` of the results
+        """
+        stylesheet = XMLMeta.Stylesheet.get(  # pylint: disable=no-member
+            stylesheet)
+        return stylesheet.transform_all(self, **params)
+
+    def __reduce__(self):
+        """
+        Pickle the contained XML (sub-)trees as UTF-8 encoded XML texts.
+
+        Items contained in other items are pickled as child index paths, so
+        every XML text is pickled only once, and the unpickled items keep
+        their relations:
+
+        >>> import pickle
+        >>> from morexml import XML
+
+        >>> xml = XML('<name><sub-name/><sub-name/></name>')
+        >>> xmllist = pickle.loads(pickle.dumps(XML.List(
+        ...     [xml, xml.sub[1], xml.sub[0]])))
+
+        >>> xmllist
+        XML.List: ['name', 'sub-name', 'sub-name']
+        >>> xmllist[1].parent is xmllist[0]
+        True
+        """
+        elements = [xml.element for xml in self._list]
+        members = set(elements)
+        tops = {}
+        xmltexts = []
+        locations = []
+        positions = {}
+        for element in elements:
+            # find the top-most contained ancestor
+            chain = [element]
+            top = 0
+            parent = element.getparent()
+            while parent is not None:
+                chain.append(parent)
+                if parent in members:
+                    top = len(chain) - 1
+                parent = parent.getparent()
+
+            path = []
+            for depth in range(top, 0, -1):
+                parent, child = chain[depth], chain[depth - 1]
+                indexes = positions.get(parent)
+                if indexes is None:
+                    indexes = positions[parent] = {
+                        node: index for index, node in enumerate(parent)}
+                path.append(indexes[child])
+
+            number = tops.get(chain[top])
+            if number is None:
+                number = tops[chain[top]] = len(xmltexts)
+                xmltexts.append(tostring(
+                    chain[top], encoding='utf-8', xml_declaration=False,
+                    with_tail=False))
+            locations.append((number, tuple(path)))
+        return unpickle_list, (xmltexts, locations)
+
     def __eq__(self, other):
         """
         Check if this and `other` contain equal XML (sub-)trees.
@@ -18,15 +18,17 @@
 
 from __future__ import absolute_import
 
+from weakref import WeakValueDictionary
+
 from moretools import dictitems, simpledict, qualname
 from six import reraise, with_metaclass
 import zetup
 
 import morexml
 from .meta import XMLMeta
-from .tools import pyname_to_xmlname, xmlname_to_pyname
+from .tools import ContextStack, pyname_to_xmlname, xmlname_to_pyname
 
-__all__ = ('NS', 'NSLookupError')
+__all__ = ('NS', 'NSLookupError', 'NSScope')
 
 
 class NSLookupError(with_metaclass(zetup.meta, LookupError)):
@@ -55,7 +57,9 @@ class NSMeta(type(NSDict.frozen)):
     """
 
     #: The stack of active :class:`morexml.XML.NS` context managers.
-    context_stack = []
+    #:
+    #: Separate per thread and ``asyncio`` task
+    context_stack = ContextStack('morexml.XML.NS')
 
 
 class NS(with_metaclass(  # pylint: disable=invalid-metaclass
@@ -153,3 +157,48 @@ class NS(with_metaclass(  # pylint: disable=invalid-metaclass
 
 # API: expose NS as nested class morexml.XML.NS
 XMLMeta.NS = NS
+
+
+class NSScope(zetup.object):
+    """
+    The namespaces in scope of XML (sub-)trees, with reverse URI lookup.
+
+    Created from an lxml ``Element.nsmap`` via :meth:`.of`, which returns
+    the same shared instance for all trees with identical scope:
+
+    >>> scope = NSScope.of({'pfx': 'urn:some:namespace'})
+    >>> scope is NSScope.of({'pfx': 'urn:some:namespace'})
+    True
+
+    >>> scope.prefix('urn:some:namespace')
+    'pfx'
+    """
+
+    __package__ = morexml
+
+    #: All existing scopes by their ``(prefix, URI)`` items.
+    _scopes = WeakValueDictionary()
+
+    @classmethod
+    def of(cls, nsmap):
+        """Get the shared scope for `nsmap` ``prefix: URI`` mapping."""
+        key = tuple(nsmap.items())
+        scope = cls._scopes.get(key)
+        if scope is None:
+            scope = cls._scopes[key] = cls(nsmap)
+        return scope
+
+    def __init__(self, nsmap):
+        """Create from `nsmap` ``prefix: URI`` mapping."""
+        self.nsmap = dict(nsmap)
+        self._prefixes = {}
+        for prefix, uri in self.nsmap.items():
+            if prefix is not None:
+                self._prefixes.setdefault(uri, prefix)
+
+    def prefix(self, uri):
+        """Get the first prefix of namespace `uri`, or ``None``."""
+        return self._prefixes.get(uri)
+
+    def __repr__(self):
+        return "{}({!r})".format(qualname(type(self)), self.nsmap)
@@ -1,32 +1,109 @@
 from __future__ import division
 
 import sys
-from copy import copy, deepcopy
 
 import zetup
-from moretools import isdict, isinteger, qualname
-from six import PY2
+from lxml.etree import XPath  # pylint: disable=no-name-in-module
+from moretools import cached, isdict, isinteger, qualname
+from six import PY2, string_types, text_type as unicode
 
 import morexml
 
 from .meta import XMLMeta
+from .tools import pyname_to_xmlname
 from .xml import XML
+from .xmlns import NSLookupError
 
 __all__ = ('Path', )
 
 
+@cached
+def compile_xpath(xpath, namespaces):
+    """
+    Compile an `xpath` expression only once per expression string.
+
+    The `namespaces` are given as hashable tuple of ``(prefix, URI)`` pairs
+    """
+    return XPath(xpath, namespaces=dict(namespaces))
+
+
+def xpath_literal(value):
+    """
+    Quote a string `value` for usage in an XPath expression.
+
+    >>> print(xpath_literal("value"))
+    'value'
+    >>> print(xpath_literal("it's"))
+    "it's"
+    >>> print(xpath_literal("it's " + '"quoted"'))
+    concat('it', "'", 's "quoted"')
+    """
+    if "'" not in value:
+        return "'{}'".format(value)
+
+    if '"' not in value:
+        return '"{}"'.format(value)
+
+    return "concat({})".format(', "\'", '.join(
+        "'{}'".format(part) for part in value.split("'")))
+
+
+def xpath_value(value):
+    """Embed a string or number `value` as literal in an XPath expression."""
+    if isinstance(value, string_types):
+        return xpath_literal(value)
+
+    return str(value)
+
+
+def clark_name(name, xmlns, kind='tag'):
+    """
+    Turn a ``prefix:name`` into ``{URI}name`` using the `xmlns` mapping.
+
+    Tags without prefix are in the default namespace, if `xmlns` has one
+    with ``None`` key, like in XML text. Other names without prefix are
+    returned unchanged. Unknown prefixes raise
+    :exc:`morexml.XML.NSLookupError`, mentioning the `kind` of the name
+    """
+    if name.startswith('{'):
+        return name
+
+    if ':' not in name:
+        uri = xmlns.get(None) if kind == 'tag' and name != '*' else None
+        if uri:
+            return "{{{}}}{}".format(uri, name)
+
+        return name
+
+    prefix, localname = name.split(':', 1)
+    try:
+        uri = xmlns[prefix]
+    except KeyError:
+        raise NSLookupError(
+            "Unknown prefix {!r} in XML {} {!r}".format(prefix, kind, name))
+
+    return "{{{}}}{}".format(uri, localname)
+
+
 class Segment(zetup.object):
+    """
+    Immutable base of all path segments.
+
+    Segments only hold plain frozen data, and can therefore be shared by
+    all paths derived from the same parent path
+    """
 
     __package__ = __name__
 
     _tag = None
 
-    _xmlns = None
+    _xmlns = frozenset()
 
     def __init__(self, xmlns=None):
         # TODO: message
         assert self._tag is not None
-        self._xmlns = dict(xmlns) if xmlns is not None else {}
+        if xmlns is not None:
+            self._xmlns = frozenset(dict(xmlns).items())
 
     @property
     def tag(self):
@@ -35,9 +112,29 @@ class Segment(zetup.object):
     def xmlns(self):
         return dict(self._xmlns)
 
+    def key(self):
+        """Get the hashable identity of this segment."""
+        return (type(self), )
+
+    def __eq__(self, other):
+        return isinstance(other, Segment) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
     def __str__(self):
         return self._tag
 
+    def to_xpath(self, qname, value=xpath_value):
+        """
+        Create the XPath step of this segment.
+
+        The `qname` callable turns ``{URI}name`` into ``prefix:name``, and
+        the `value` callable turns filter values and positions into XPath
+        expressions, like literals or variable references
+        """
+        return self._tag
+
 
 class Root(Segment):
 
@@ -51,56 +148,152 @@ class Deep(Segment):
 
 class Element(Segment):
 
-    _xml = None
+    #: The ``(name, value)`` pairs of XML attribute filters, as given.
+    _xmlattrs = ()
+
+    #: The XML attribute filters with ``{URI}name`` instead of prefixes.
+    _clark_xmlattrs = ()
+
+    #: The tag in ``{URI}name`` format.
+    _clark_tag = None
 
     _index = None
 
-    def __init__(self, index=None, xmlns=None, **xmlattrs):
+    def __init__(self, index=None, xmlns=None, attrs=None, **xmlattrs):
         super(Element, self).__init__(xmlns=xmlns)
         # TODO: message
         assert index is None or isinteger(index)
 
-        tag = self._tag if self._tag not in '.*' else 'X'
-        self._xml = XML.root[tag](xmlns=xmlns, **xmlattrs)
+        items = list(dict(attrs).items()) if attrs is not None else []
+        items.extend(
+            (pyname_to_xmlname(name), value)
+            for name, value in xmlattrs.items())
+        self._xmlattrs = tuple(
+            (name, unicode(value)) for name, value in items)
+
+        xmlns = dict(self._xmlns)
+        self._clark_tag = clark_name(self._tag, xmlns)
+        self._clark_xmlattrs = tuple(
+            (clark_name(name, xmlns, kind='attribute'), value)
+            for name, value in self._xmlattrs)
         self._index = index
 
+    def xmlattrs(self):
+        return dict(self._xmlattrs)
+
+    @property
+    def index(self):
+        return self._index
+
+    def key(self):
+        return (
+            type(self), self._clark_tag, frozenset(self._clark_xmlattrs),
+            self._index)
+
     def __str__(self):
         text = super(Element, self).__str__()
-        xmlattrs = self._xml._element.attrib
-        if xmlattrs:
+        if self._xmlattrs:
             text += "[{}]".format(','.join(
-                "{}='{}'".format(*item) for item in xmlattrs.items()))
+                "{}='{}'".format(*item) for item in self._xmlattrs))
         if self._index is not None:
             text += "[{}]".format(self._index)
         return text
 
+    def to_xpath(self, qname, value=xpath_value):
+        xmlns = dict(self._xmlns)
+        step = self.xpath_node_test(qname, xmlns)
+        for key, xmlvalue in self._clark_xmlattrs:
+            step += "[@{}={}]".format(qname(key, xmlns), value(xmlvalue))
+
+        index = self._index
+        if index is not None:
+            # Python-like indexing ==> 0 is first, -1 is last
+            if index >= 0:
+                step += "[{}]".format(value(index + 1))
+            elif index == -1:
+                step += "[last()]"
+            else:
+                step += "[last()-{}]".format(value(-index - 1))
+        return step
+
+    def xpath_node_test(self, qname, xmlns):
+        return qname(self._clark_tag, xmlns)
+
+    def replace(self, index=None, attrs=None):
+        """
+        Create a copy of this segment with other `index` and/or `attrs`.
+
+        Only given arguments replace the current values
+        """
+        return type(self)(
+            index=index if index is not None else self._index,
+            xmlns=self._xmlns,
+            attrs=attrs if attrs is not None else self._xmlattrs)
+
 
 class Any(Element):
 
     _tag = '*'
 
+    def xpath_node_test(self, qname, xmlns):
+        return '*'
+
 
 class Tagged(Element):
 
-    def __init__(self, tag, index=None, xmlns=None, **xmlattrs):
+    def __init__(self, tag, index=None, xmlns=None, attrs=None, **xmlattrs):
         self._tag = tag
-        super(Tagged, self).__init__(index=index, xmlns=xmlns, **xmlattrs)
+        super(Tagged, self).__init__(
+            index=index, xmlns=xmlns, attrs=attrs, **xmlattrs)
+
+    def replace(self, index=None, attrs=None):
+        return type(self)(
+            self._tag, index=index if index is not None else self._index,
+            xmlns=self._xmlns,
+            attrs=attrs if attrs is not None else self._xmlattrs)
 
 
 class Meta(zetup.meta):
 
     def segment_to_xml(cls, segment, root=False):
         # TODO: exception type + message
-        assert isinstance(segment._xml, XML)
+        assert isinstance(segment, Tagged)
+
+        xmlcls = XML.root if root else XML
+        return xmlcls[segment.tag](
+            segment.xmlattrs(), xmlns=segment.xmlns())
 
-        if root:
-            return segment._xml.to_root()
 
-        return copy(segment._xml)
+def unpickle_path(segments):
+    """Recreate a pickled :class:`morexml.XML.Path` from its `segments`."""
+    path = None
+    for segment in segments:
+        path = Path._extend(path, segment)  # pylint: disable=protected-access
+    return path
 
 
 class Path(zetup.object, metaclass=Meta):
-    """The :class:`morexml.XML.Path` factory."""
+    """
+    The :class:`morexml.XML.Path` factory.
+
+    Paths are immutable. Every derived path shares its parent path and all
+    segment data with it. So paths are cheap to create, and can be compared
+    and used as ``dict`` keys:
+
+    >>> from morexml import XML
+
+    >>> with XML.NS(pfx='urn:some:namespace'):
+    ...     path = XML.Path() / 'pfx:name' / 'sub-name'
+
+    >>> path.parentpath() / 'sub-name' == path
+    True
+
+    >>> with XML.NS(other='urn:some:namespace'):
+    ...     other_path = XML.Path() / 'other:name' / 'sub-name'
+
+    >>> {path: 'value'}[other_path]
+    'value'
+    """
 
     # used by zetup.meta's class __repr__ instead of __module__
     __package__ = morexml
@@ -108,7 +301,24 @@ class Path(zetup.object, metaclass=Meta):
     # API: reflect exposure as nested class morexml.XML.Path
     __qualname__ = "XML.Path"
 
-    _segments = None
+    #: The parent path, shared by all paths derived from it.
+    _parentpath = None
+
+    #: The last segment of this path.
+    _segment = None
+
+    #: The ``tuple`` of all segments, created on demand.
+    _segment_tuple = None
+
+    #: The hash value, derived from parent path hash and last segment.
+    _hash = None
+
+    #: The XPath expression with its namespaces and variables, created on
+    #: demand.
+    _xpath_data = None
+
+    #: The compiled lxml ``XPath`` object, created on first query.
+    _xpath = None
 
     def __init__(
             self, tag=None, index=None, parentpath=None, xmlns=None,
@@ -127,32 +337,83 @@ class Path(zetup.object, metaclass=Meta):
         if tag is None:
             # TODO: message
             assert parentpath is None
-            self._segments = (Root(xmlns=_ns), )
+            seg = Root(xmlns=_ns)
 
+        elif tag == '':
+            # TODO: message
+            assert index is None and not xmlattrs
+            seg = Deep(xmlns=_ns)
+        elif tag == '*':
+            seg = Any(index=index, xmlns=_ns, **xmlattrs)
         else:
-            if tag == '':
-                # TODO: message
-                assert index is None and not xmlattrs
-                seg = Deep(xmlns=_ns)
-            elif tag == '*':
-                seg = Any(index=index, xmlns=_ns, **xmlattrs)
-            else:
-                seg = Tagged(tag, index=index, xmlns=_ns, **xmlattrs)
+            seg = Tagged(tag, index=index, xmlns=_ns, **xmlattrs)
+
+        self._link(parentpath, seg)
+
+    def _link(self, parentpath, segment):
+        """Initialize this path as `parentpath` extended by `segment`."""
+        self._parentpath = parentpath
+        self._segment = segment
+        self._hash = hash((
+            parentpath._hash if parentpath is not None else None, segment))
+
+    @classmethod
+    def _extend(cls, parentpath, segment):
+        """Create a path from `parentpath` extended by existing `segment`."""
+        path = cls.__new__(cls)
+        path._link(parentpath, segment)  # pylint: disable=protected-access
+        return path
 
-            self._segments = (
-                (parentpath and deepcopy(parentpath._segments) or ()) +
-                (seg, ))
+    @property
+    def _segments(self):
+        """Get the ``tuple`` of all segments of this path."""
+        segments = self._segment_tuple
+        if segments is None:
+            path, tail = self, []
+            while path is not None and path._segment_tuple is None:
+                tail.append(path._segment)
+                path = path._parentpath
+            segments = self._segment_tuple = (
+                path._segment_tuple if path is not None else ()
+            ) + tuple(reversed(tail))
+        return segments
 
     def parentpath(self):
-        if len(self._segments) == 1:
-            return None
-
-        path = type(self)()
-        path._segments = deepcopy(self._segments[:-1])
-        return path
+        return self._parentpath
 
     def xmlns(self):
-        return self._segments[-1].xmlns()
+        return self._segment.xmlns()
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Path):
+            return False
+
+        path = self
+        while path is not other:
+            if (path is None or other is None or path._hash != other._hash or
+                    path._segment != other._segment):
+                return False
+
+            path, other = path._parentpath, other._parentpath
+        return True
+
+    def __reduce__(self):
+        """
+        Pickle this path as ``tuple`` of its plain data segments.
+
+        Without the compiled XPath, which is created again on demand:
+
+        >>> import pickle
+        >>> from morexml import XML
+
+        >>> path = XML.Path() / 'name' / 'sub-name'
+        >>> pickle.loads(pickle.dumps(path)) == path
+        True
+        """
+        return unpickle_path, (self._segments, )
 
     def __div__(self, tag):
         return type(self)(tag, parentpath=self)
@@ -163,20 +424,21 @@ class Path(zetup.object, metaclass=Meta):
         return self / '' / tag
 
     def __getitem__(self, key):
-        lastseg = self._segments[-1]
-        xmlattrs = dict(
-            lastseg._xml._element.attrib)  # pylint: disable=no-member
+        lastseg = self._segment
+        if not isinstance(lastseg, Element):
+            raise TypeError(
+                "{!r} doesn't support index or attribute filters"
+                .format(self))
 
         if isinteger(key):
-            return type(self)(
-                lastseg.tag, index=key, xmlns=lastseg.xmlns(),
-                parentpath=self.parentpath(),
-                **lastseg._xml._element.attrib)  # pylint: disable=no-member
-
-        xmlattrs.update(key)
-        return type(self)(
-            lastseg.tag, index=lastseg._index,  # pylint: disable=no-member
-            xmlns=lastseg.xmlns(), parentpath=self.parentpath(), **key)
+            seg = lastseg.replace(index=key)
+        else:
+            xmlattrs = lastseg.xmlattrs()
+            xmlattrs.update(
+                (pyname_to_xmlname(name), value)
+                for name, value in dict(key).items())
+            seg = lastseg.replace(attrs=xmlattrs)
+        return type(self)._extend(self._parentpath, seg)
 
     def __add__(self, other):
         if not isinstance(other, Path):
@@ -187,9 +449,9 @@ class Path(zetup.object, metaclass=Meta):
         # TODO: message
         assert not isinstance(other._segments[0], Root)
 
-        path = Path()
-        path._segments = (
-            deepcopy(self._segments) + deepcopy(other._segments))
+        path = self
+        for seg in other._segments:
+            path = type(self)._extend(path, seg)
         return path
 
     def __str__(self):
@@ -210,23 +472,197 @@ class Path(zetup.object, metaclass=Meta):
         return segments_to_xml(self._segments, _root=root)
 
     def to_xpath(self):
-        # TODO: message
-        assert all(isinstance(seg, Tagged) for seg in self._segments)
-
-        def segment_to_xpath(segment):
-            tag = segment.tag
-            if ':' in tag:
-                prefix, tag = tag.split(':')
-                uri = segment.xmlns()[prefix]
-            else:
-                uri = None
-
-            filters = "name()='{}'".format(tag)
-            if uri is not None:
-                filters += " and namespace-uri()='{}'".format(uri)
-            return "*[{}]".format(filters)
-
-        return '/'.join(map(segment_to_xpath, self._segments))
+        """
+        Create an XPath expression from this path.
+
+        >>> from morexml import XML
+
+        >>> with XML.NS(pfx='urn:some:namespace'):
+        ...     path = XML.Path() / 'pfx:name' // 'sub-name'
+        >>> print(path.to_xpath())
+        /pfx:name//sub-name
+
+        ``prefix:name`` steps are kept as qualified names for lxml's direct
+        name matching. The namespace definitions are given by
+        :meth:`.xpath_namespaces`. ``*`` steps, attribute filters, and
+        Python-style indexes are also supported:
+
+        >>> print((XML.Path('name') / '*')[{'attr': 'value'}][0].to_xpath())
+        name/*[@attr='value'][1]
+
+        Steps without prefix match tags in the default namespace of the
+        :class:`morexml.XML.NS` context, if any, like in XML text. They get
+        a generated prefix, because XPath has no default namespace.
+        Attribute names without prefix never have a namespace:
+
+        >>> with XML.NS({None: 'urn:some:namespace'}):
+        ...     path = XML.Path() / 'name' / 'sub-name'
+        >>> print(path.to_xpath())
+        /ns0:name/ns0:sub-name
+
+        >>> xml = XML('<name xmlns="urn:some:namespace"><sub-name/></name>')
+        >>> path.find(xml) is xml.sub[0]
+        True
+        """
+        return self._build_xpath(xpath_value)[0]
+
+    def xpath_namespaces(self):
+        """
+        Get the ``prefix: URI`` mapping used in :meth:`.to_xpath` results.
+
+        >>> from morexml import XML
+
+        >>> with XML.NS(pfx='urn:some:namespace'):
+        ...     path = XML.Path() / 'pfx:name' // 'sub-name'
+        >>> path.xpath_namespaces()
+        {'pfx': 'urn:some:namespace'}
+        """
+        return dict(self._plan()[1])
+
+    def xpath_variables(self):
+        """
+        Get the XPath variable values of the compiled XPath of this path.
+
+        The compiled XPath expression has variables instead of the filter
+        values and positions of :meth:`.to_xpath` results. So all paths with
+        the same structure share one compiled XPath:
+
+        >>> from morexml import XML
+
+        >>> path = XML.Path('name')[{'attr': 'value'}][0]
+        >>> path.xpath_variables()
+        {'v0': 'value', 'v1': 1}
+
+        >>> path.compile() is XML.Path('name')[{'attr': 'other'}][1].compile()
+        True
+        """
+        return dict(self._plan()[2])
+
+    def _plan(self):
+        """
+        Create XPath expression with variables only once.
+
+        Together with the ``(prefix, URI)`` pairs and the ``(name, value)``
+        pairs of the variables
+        """
+        data = self._xpath_data
+        if data is None:
+            variables = []
+
+            def variable(value):
+                name = "v{}".format(len(variables))
+                variables.append((name, value))
+                return '$' + name
+
+            data = self._xpath_data = self._build_xpath(variable) + (
+                tuple(variables), )
+        return data
+
+    def _build_xpath(self, value):
+        """
+        Create XPath expression and ``(prefix, URI)`` pairs.
+
+        The `value` callable turns filter values and positions into XPath
+        expressions. Equal prefixes of different namespaces in different
+        segments are replaced with unique ``ns<number>`` prefixes
+        """
+        namespaces = {}
+        uri_prefixes = {}
+
+        def qname(name, nsmap):
+            if not name.startswith('{'):
+                return name
+
+            uri, name = name[1:].split('}', 1)
+            prefix = uri_prefixes.get(uri)
+            if prefix is None:
+                for key, value in nsmap.items():
+                    if key is not None and value == uri:
+                        prefix = key
+                        break
+
+                count = len(namespaces)
+                while prefix is None or prefix in namespaces:
+                    prefix = "ns{}".format(count)
+                    count += 1
+                namespaces[prefix] = uri
+                uri_prefixes[uri] = prefix
+            return ':'.join((prefix, name))
+
+        segments = self._segments
+        steps = [seg.to_xpath(qname, value) for seg in segments]
+        if len(steps) == 1 and isinstance(segments[0], Root):
+            xpath = '/*'
+        else:
+            xpath = '/'.join(steps)
+            if isinstance(segments[0], Deep):
+                xpath = './' + xpath
+            if isinstance(segments[-1], Deep):
+                xpath += '*'
+
+        return xpath, tuple(sorted(namespaces.items()))
+
+    def compile(self):
+        """
+        Get the compiled lxml ``XPath`` object of this path.
+
+        Compilation results are cached, also across paths with the same
+        structure. It must be called with :meth:`.xpath_variables`
+        """
+        xpath = self._xpath
+        if xpath is None:
+            xpath = self._xpath = compile_xpath(*self._plan()[:2])
+        return xpath
+
+    def iterfind(self, xml):
+        """
+        Iterate all XML sub-trees of `xml` that match this path.
+
+        The query runs in one compiled lxml ``XPath`` evaluation, and
+        :class:`morexml.XML` instances are only created while iterating
+        """
+        wrap = XML._wrap  # pylint: disable=protected-access
+        for element in self.compile()(
+                xml.element, **self.xpath_variables()):
+            yield wrap(element)
+
+    def findall(self, xml):
+        """
+        Get a :class:`morexml.XML.List` of all `xml` sub-trees matching this.
+
+        >>> from morexml import XML
+
+        >>> with XML['name']() as xml:
+        ...     with XML['sub-name']():
+        ...         XML['leaf'](attr='value')
+        ...         XML['leaf'](attr='other value')
+        XML[...
+
+        >>> (XML.Path('sub-name') / 'leaf').findall(xml)['attr']
+        ('value', 'other value')
+        """
+        return XML.List(self.iterfind(xml))
+
+    def find(self, xml):
+        """
+        Get the first XML sub-tree of `xml` matching this path.
+
+        >>> from morexml import XML
+
+        >>> with XML['name']() as xml:
+        ...     with XML['sub-name']():
+        ...         XML['leaf']()
+        XML[...
+
+        >>> (XML.Path('sub-name') / 'leaf').find(xml) is xml.sub[0].sub[0]
+        True
+
+        Or ``None`` if nothing matches
+        """
+        for found in self.iterfind(xml):
+            return found
+
+        return None
 
     def __repr__(self):
         """Create an XPath-style representation."""
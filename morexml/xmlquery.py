@@ -0,0 +1,278 @@
+# moreXML >>> eXcitinglyMORE pythonicity on top of LXML's efficiency
+#
+# Copyright (C) 2019 ADVA Optical Networking SE
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Define the lazy, chainable :class:`morexml.XML.Query`."""
+
+from __future__ import absolute_import
+
+from itertools import islice
+
+import zetup
+from moretools import isinteger, qualname
+from six import text_type as unicode
+
+import morexml
+from .meta import XMLMeta
+from .tools import pyname_to_xmlname
+from .xml import XML
+from .xmlpath import clark_name, compile_xpath
+
+__all__ = ('Query', )
+
+
+class Query(zetup.object):
+    """
+    A lazy query on :class:`morexml.XML` trees, planned as a single XPath.
+
+    Created via :meth:`morexml.XML.query` or :meth:`morexml.XML.List.query`.
+    Every chained method call only creates a new query. Nothing is evaluated
+    before iterating the final query, and only the resulting sub-trees get
+    :class:`morexml.XML` instances:
+
+    >>> from morexml import XML
+
+    >>> with XML['interfaces']() as xml:
+    ...     with XML['interface'](name='eth0', type='ethernet'):
+    ...         XML['mtu'](value='1500')
+    ...     with XML['interface'](name='lo0', type='loopback'):
+    ...         XML['mtu'](value='16384')
+    ...     with XML['interface'](name='eth1', type='ethernet'):
+    ...         XML['mtu'](value='9000')
+    XML[...
+
+    >>> query = xml.query().children('interface').where(type='ethernet')
+    >>> query
+    XML.Query: ./interface[@type=$v0] with $v0='ethernet'
+
+    >>> list(query.children('mtu'))
+    [XML['mtu']:
+    <mtu value="1500"/>, XML['mtu']:
+    <mtu value="9000"/>]
+
+    >>> query.limit(1).values('name')
+    ['eth0']
+
+    >>> xml.query().children('interface').limit(2).children('mtu').values(
+    ...     'value')
+    ['1500', '16384']
+
+    >>> xml.query().descendants('mtu').values('value')
+    ['1500', '16384', '9000']
+    """
+
+    # used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested class morexml.XML.Query
+    __qualname__ = "XML.Query"
+
+    #: The XML (sub-)trees to query.
+    _sources = ()
+
+    #: The planned XPath expression, relative to every source tree.
+    _xpath = '.'
+
+    #: The ``(prefix, URI)`` pairs used in the XPath expression.
+    _namespaces = ()
+
+    #: The overall maximum number of results.
+    _limit = None
+
+    #: The ``(name, value)`` pairs of XPath variables in the expression.
+    #:
+    #: Values are bound on evaluation, so that the compiled XPath can be
+    #: reused for all queries with the same structure
+    _variables = ()
+
+    def __init__(self, sources, xmlns=None):
+        """
+        Start a query on XML (sub-)tree `sources`.
+
+        The optional `xmlns` mapping and the active :class:`morexml.XML.NS`
+        context are used for resolving ``prefix:name`` tags and attributes
+        """
+        self._sources = tuple(sources)
+        nsmeta = type(XML.NS)  # pylint: disable=no-member
+        nsctx = dict(nsmeta.context_stack[-1]) if nsmeta.context_stack else {}
+        if xmlns is not None:
+            nsctx.update(xmlns)
+        self._xmlns = nsctx
+
+    def _derive(
+            self, xpath=None, limit=None, namespaces=None, variables=None):
+        """
+        Create a new query with extended XPath.
+
+        The overall `limit` of results only applies as long as
+        :meth:`.limit` is the last step. Further steps start from the
+        already limited results of every source tree
+        """
+        query = type(self).__new__(type(self))
+        query.__dict__.update(self.__dict__)
+        if xpath is not None:
+            query._xpath = xpath
+        query._limit = limit
+        if namespaces is not None:
+            query._namespaces = namespaces
+        if variables is not None:
+            query._variables = variables
+        return query
+
+    def _qname(self, name, namespaces, kind='tag'):
+        """
+        Turn a `name` into a qualified XPath name.
+
+        And get the ``(prefix, URI)`` pairs of `namespaces` extended by the
+        one needed for that name
+        """
+        name = clark_name(name, self._xmlns, kind=kind)
+        if not name.startswith('{'):
+            return name, namespaces
+
+        uri, localname = name[1:].split('}', 1)
+        mapping = dict(namespaces)
+        for prefix, value in namespaces:
+            if value == uri:
+                break
+        else:
+            prefix = None
+            for key, value in self._xmlns.items():
+                if key is not None and value == uri and key not in mapping:
+                    prefix = key
+                    break
+
+            count = len(mapping)
+            while prefix is None or prefix in mapping:
+                prefix = "ns{}".format(count)
+                count += 1
+            namespaces = namespaces + ((prefix, uri), )
+        return ':'.join((prefix, localname)), namespaces
+
+    def children(self, tag=None):
+        """Query the direct sub-trees with `tag`, or all if not given."""
+        if tag is None:
+            return self._derive(xpath=self._xpath + '/*')
+
+        qname, namespaces = self._qname(tag, self._namespaces)
+        return self._derive(
+            xpath='/'.join((self._xpath, qname)), namespaces=namespaces)
+
+    def descendants(self, tag=None):
+        """Query all deeper sub-trees with `tag`, or all if not given."""
+        if tag is None:
+            return self._derive(xpath=self._xpath + '//*')
+
+        qname, namespaces = self._qname(tag, self._namespaces)
+        return self._derive(
+            xpath='//'.join((self._xpath, qname)), namespaces=namespaces)
+
+    def where(self, attrs=None, **kwattrs):
+        """
+        Only query sub-trees with all given XML attribute values.
+
+        Attributes can be given as ``dict`` and/or keyword arguments, with
+        underscores converted to hyphens like in the :class:`morexml.XML`
+        factory
+        """
+        items = list(dict(attrs).items()) if attrs is not None else []
+        items.extend(
+            (pyname_to_xmlname(name), value)
+            for name, value in kwattrs.items())
+
+        xpath = self._xpath
+        if xpath == '.':  # ==> no predicates allowed for abbreviated step
+            xpath = 'self::*'
+        namespaces = self._namespaces
+        variables = self._variables
+        for name, value in items:
+            qname, namespaces = self._qname(name, namespaces, kind='attribute')
+            variable = "v{}".format(len(variables))
+            xpath += "[@{}=${}]".format(qname, variable)
+            variables += ((variable, unicode(value)), )
+        return self._derive(
+            xpath=xpath, namespaces=namespaces, variables=variables)
+
+    def limit(self, count):
+        """Only query the first `count` results."""
+        if not isinteger(count) or count < 0:
+            raise ValueError(
+                "{!r}.limit() needs a non-negative integer, not {!r}"
+                .format(type(self), count))
+
+        if self._limit is not None:
+            count = min(count, self._limit)
+        variable = "v{}".format(len(self._variables))
+        return self._derive(
+            xpath="({})[position() <= ${}]".format(self._xpath, variable),
+            limit=count, variables=self._variables + ((variable, count), ))
+
+    def _evaluate(self, xpath, namespaces=None):
+        """Iterate the results of `xpath` for all source trees."""
+        if namespaces is None:
+            namespaces = self._namespaces
+        compiled = compile_xpath(xpath, tuple(sorted(namespaces)))
+        variables = dict(self._variables)
+        results = (
+            result for xml in self._sources
+            for result in compiled(xml.element, **variables))
+        if self._limit is not None:
+            results = islice(results, self._limit)
+        return results
+
+    def __iter__(self):
+        """Evaluate the query and iterate the resulting XML sub-trees."""
+        wrap = XML._wrap  # pylint: disable=protected-access
+        for element in self._evaluate(self._xpath):
+            yield wrap(element)
+
+    def list(self):
+        """Evaluate the query and get a :class:`morexml.XML.List`."""
+        return XML.List(self)
+
+    def values(self, xmlattr):
+        """
+        Evaluate the query and get a ``list`` of `xmlattr` values.
+
+        Results without that attribute are skipped. No :class:`morexml.XML`
+        instances are created at all
+        """
+        xmlattr = pyname_to_xmlname(xmlattr)
+        if self._limit is not None:
+            # limit applies to the sub-trees, not to the attribute values
+            xmlattr = clark_name(xmlattr, self._xmlns, kind='attribute')
+            values = (
+                element.get(xmlattr)
+                for element in self._evaluate(self._xpath))
+            return [unicode(value) for value in values if value is not None]
+
+        qname, namespaces = self._qname(
+            xmlattr, self._namespaces, kind='attribute')
+        return [
+            unicode(value) for value in self._evaluate(
+                '/@'.join((self._xpath, qname)), namespaces=namespaces)]
+
+    def __repr__(self):
+        """Create a representation with the planned XPath expression."""
+        text = "{}: {}".format(qualname(type(self)), self._xpath)
+        if self._variables:
+            text += " with " + ", ".join(
+                "${}={!r}".format(name, value)
+                for name, value in self._variables)
+        return text
+
+
+# API: expose Query as nested class morexml.XML.Query
+XMLMeta.Query = Query
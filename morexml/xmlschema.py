@@ -0,0 +1,239 @@
+# moreXML >>> eXcitinglyMORE pythonicity on top of LXML's efficiency
+#
+# Copyright (C) 2019 ADVA Optical Networking SE
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Define the compiled, cached validator :class:`morexml.XML.Schema`."""
+
+from __future__ import absolute_import
+
+import os
+from collections import namedtuple
+from hashlib import sha1
+from threading import Lock, local
+
+import zetup
+from lxml.etree import (  # pylint: disable=no-name-in-module
+    RelaxNG, XMLSchema, XPathEvalError, fromstring)
+from moretools import qualname
+from six import with_metaclass
+
+import morexml
+from .meta import XMLMeta
+from .xml import XML
+from .xmlelement import make_parser
+
+try:
+    from lxml.isoschematron import Schematron
+except ImportError:  # pragma: no cover
+    Schematron = None
+
+__all__ = ('Schema', 'ValidationError', 'Violation')
+
+#: The lxml validator classes by the namespace URI of schema root elements.
+VALIDATORS = {
+    'http://www.w3.org/2001/XMLSchema': XMLSchema,
+    'http://relaxng.org/ns/structure/1.0': RelaxNG,
+    'http://purl.oclc.org/dsdl/schematron': Schematron,
+}
+
+#: A single schema violation of a validated XML tree.
+#:
+#: The `path` is the :class:`morexml.XML.Path` of the violating sub-tree, or
+#: ``None`` if the validator doesn't report it. The `line` is only given for
+#: parsed XML trees
+Violation = namedtuple('Violation', ('message', 'path', 'line'))
+
+
+class ValidationError(with_metaclass(zetup.meta, ValueError)):
+    """An XML tree violates a :class:`morexml.XML.Schema`."""
+
+    # API: used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested exc class morexml.XML.ValidationError
+    __qualname__ = 'XML.ValidationError'
+
+    def __init__(self, violations):
+        """Create from the ``list`` of :class:`.Violation` tuples."""
+        super(ValidationError, self).__init__("\n".join(
+            "{}: {}".format(violation.path, violation.message)
+            for violation in violations))
+        self.violations = violations
+
+
+# API: expose ValidationError as nested exc class of morexml.XML
+XMLMeta.ValidationError = ValidationError
+
+
+class Schema(zetup.object):
+    """
+    A compiled XSD, RelaxNG, or Schematron validator for XML trees.
+
+    Use :meth:`.load` for loading schema files, which are compiled only once
+    per file path and content. The schema type is determined from the root
+    element's namespace. Validation can be done in parallel threads, which
+    compile their own validator on first use, because lxml validators keep
+    their error log:
+
+    >>> from morexml import XML
+
+    >>> schema = XML.Schema(XML(
+    ...     '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">'
+    ...     '<xs:element name="interfaces"><xs:complexType><xs:sequence>'
+    ...     '<xs:element name="interface" maxOccurs="unbounded">'
+    ...     '<xs:complexType><xs:attribute name="mtu" type="xs:int"/>'
+    ...     '</xs:complexType></xs:element>'
+    ...     '</xs:sequence></xs:complexType></xs:element></xs:schema>'))
+
+    >>> with XML['interfaces']() as xml:
+    ...     XML['interface'](mtu=1500)
+    ...     XML['interface'](mtu='jumbo')
+    XML[...
+
+    :meth:`morexml.XML.validate` reports all violations, with the
+    :class:`morexml.XML.Path` of the violating sub-tree:
+
+    >>> for violation in xml.validate(schema):
+    ...     print(violation.path)
+    /interfaces/interface[1]
+    """
+
+    # used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested class morexml.XML.Schema
+    __qualname__ = "XML.Schema"
+
+    #: The single violation type of validation results.
+    Violation = Violation
+
+    #: All loaded schemas by absolute file path and content digest.
+    _loaded = {}
+
+    #: Serializes loading and compiling of schema files.
+    _loading = Lock()
+
+    def __init__(self, source):
+        """
+        Compile a validator from schema `source`.
+
+        Which can be given as :class:`morexml.XML` tree or lxml ``Element``
+        """
+        element = source.element if isinstance(source, XML) else source
+        uri = element.tag[1:].split('}', 1)[0]
+        validator = VALIDATORS.get(uri)
+        if validator is None:
+            raise ValueError(
+                "{!r} doesn't support schemas of namespace {!r}"
+                .format(type(self), uri))
+
+        self._element = element
+        self._validator = validator(element)
+        self._local = local()
+        self._local.validator = self._validator
+
+    @classmethod
+    def load(cls, path):
+        """
+        Get the compiled schema from file `path`.
+
+        Every file is only compiled once, and compiled again when its
+        content changes. Relative includes and imports are resolved from
+        the file's location
+        """
+        path = os.path.abspath(path)
+        with open(path, 'rb') as source:
+            content = source.read()
+        key = (path, sha1(content).digest())
+        with cls._loading:
+            schema = cls._loaded.get(key)
+            if schema is None:
+                schema = cls._loaded[key] = cls(fromstring(
+                    content, make_parser(), base_url=path))
+        return schema
+
+    def _thread_validator(self):
+        """Get the compiled validator for the current thread."""
+        validator = getattr(self._local, 'validator', None)
+        if validator is None:
+            validator = self._local.validator = type(self._validator)(
+                self._element)
+        return validator
+
+    def _violations(self, element):
+        """Validate lxml `element` and get all :class:`.Violation` tuples."""
+        validator = self._thread_validator()
+        if validator.validate(element):
+            return []
+
+        errors = list(validator.error_log)
+
+        nsmap = {
+            prefix: uri for prefix, uri in element.nsmap.items()
+            if prefix is not None}
+        wrap = XML._wrap  # pylint: disable=protected-access
+        violations = []
+        for error in errors:
+            path = None
+            found = self._locate(element, error.path, nsmap)
+            if found is not None:
+                path = wrap(found).path()
+            violations.append(Violation(
+                error.message, path, error.line or None))
+        return violations
+
+    @staticmethod
+    def _locate(element, xpath, nsmap):
+        """
+        Find the violating lxml element from an error's `xpath`.
+
+        The path of errors is relative to the validated `element` as root
+        """
+        if not xpath or not xpath.startswith('/'):
+            return None
+
+        steps = xpath[1:].split('/', 1)
+        if len(steps) == 1:
+            return element
+
+        try:
+            found = element.xpath(steps[1], namespaces=nsmap)
+        except XPathEvalError:
+            return None
+
+        return found[0] if found else None
+
+    def validate(self, xml):
+        """Get a ``list`` of :class:`.Violation` tuples for `xml` tree."""
+        return self._violations(xml.element)
+
+    def validate_all(self, xmls):
+        """Get a ``list`` of :class:`.Violation` lists for all `xmls`."""
+        return [self._violations(xml.element) for xml in xmls]
+
+    def assert_valid(self, xml):
+        """Raise :exc:`morexml.XML.ValidationError` if `xml` is invalid."""
+        violations = self.validate(xml)
+        if violations:
+            raise ValidationError(violations)
+
+    def __repr__(self):
+        """Create a representation with the validator type."""
+        return "{}: {}".format(
+            qualname(type(self)), type(self._validator).__name__)
+
+
+# API: expose Schema as nested class morexml.XML.Schema
+XMLMeta.Schema = Schema
@@ -0,0 +1,281 @@
+# moreXML >>> eXcitinglyMORE pythonicity on top of LXML's efficiency
+#
+# Copyright (C) 2019 ADVA Optical Networking SE
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Define :class:`morexml.XML.Template` with :class:`morexml.XML.Slot`."""
+
+from __future__ import absolute_import
+
+import re
+from copy import deepcopy
+
+import zetup
+from lxml.etree import (  # pylint: disable=no-name-in-module
+    Element, tounicode)
+from moretools import qualname
+from six import text_type as unicode, with_metaclass
+
+import morexml
+from .meta import XMLMeta
+from .xml import XML
+from .xmlelement import copy_element
+
+__all__ = ('Slot', 'Template')
+
+# slot placeholders and slot locations are marked with private use area
+# characters, which are valid in XML, but not expected in actual data
+
+#: Matches :class:`morexml.XML.Slot` markers in attribute values and texts.
+SLOT_MARKER = re.compile(u'\ue000([^\ue000\ue001]*)\ue001')
+
+#: Matches the numbered slot location markers in serialized prototypes.
+LOCATION_MARKER = re.compile(u'\ue002([0-9]+)\ue003')
+
+
+def escape_text(text):
+    """Escape `text` for serialized XML element content."""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace(
+        '>', '&gt;').replace('\r', '&#13;')
+
+
+def escape_xmlattr(value):
+    """Escape `value` for serialized double-quoted XML attribute values."""
+    return escape_text(value).replace('"', '&quot;').replace(
+        '\n', '&#10;').replace('\t', '&#9;')
+
+
+class Slot(with_metaclass(zetup.meta, unicode)):
+    """
+    A named placeholder for attribute values and texts of XML templates.
+
+    Can be used like any other text value when creating XML trees with the
+    :class:`morexml.XML` factory, also as part of longer texts. See
+    :class:`morexml.XML.Template` for details
+    """
+
+    # used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested class morexml.XML.Slot
+    __qualname__ = "XML.Slot"
+
+    def __new__(cls, name):
+        """Create a placeholder for the template value with `name`."""
+        if any(char in name for char in u'\ue000\ue001\ue002\ue003'):
+            raise ValueError(
+                "Invalid {!r} name {!r}".format(cls, name))
+
+        slot = unicode.__new__(cls, u'\ue000{}\ue001'.format(name))
+        slot._name = name
+        return slot
+
+    @property
+    def name(self):
+        """Get the name of the template value for this placeholder."""
+        return self._name
+
+    def __repr__(self):
+        return "{}({!r})".format(qualname(type(self)), self._name)
+
+
+class Template(zetup.object):
+    """
+    An immutable XML tree prototype with named value slots.
+
+    Created via :meth:`morexml.XML.template` from an XML tree, whose
+    attribute values and texts can contain :class:`morexml.XML.Slot`
+    placeholders:
+
+    >>> from morexml import XML
+
+    >>> with XML.NS({'if': 'urn:some:interfaces'}):
+    ...     with XML['if:interface'](name=XML.Slot('name')) as xml:
+    ...         XML['if:description']().text = "Port " + XML.Slot('name')
+    ...         XML['if:mtu']().text = XML.Slot('mtu')
+
+    >>> template = xml.template()
+    >>> template
+    XML.Template: ['name', 'mtu']
+
+    Every rendering copies the prototype's lxml ``Element`` tree at once and
+    fills in the values, without going through the factory classes or the
+    :class:`morexml.XML.NS` context:
+
+    >>> template.render(name='eth0', mtu=1500)
+    XML['if:interface']:
+    <if:interface xmlns:if="urn:some:interfaces" name="eth0">
+      <if:description>Port eth0</if:description>
+      <if:mtu>1500</if:mtu>
+    </if:interface>
+
+    Rendering directly to UTF-8 encoded XML text doesn't even create any
+    lxml ``Element``, but just joins the prototype's serialized fragments
+    with the escaped values:
+
+    >>> template.render_bytes(name='a&b', mtu=9000)
+    b'<if:interface xmlns:if="urn:some:interfaces" name="a&amp;b"><if:desc...'
+
+    Templates from sub-trees declare all namespaces in scope, also for
+    prefixes only used in texts:
+
+    >>> with XML.NS({'if': 'urn:some:interfaces',
+    ...              'ianaift': 'urn:some:iana-if-type'}):
+    ...     with XML['if:interfaces']() as xml:
+    ...         with XML['if:interface'](name=XML.Slot('name')):
+    ...             XML['if:type']().text = 'ianaift:' + XML.Slot('type')
+
+    >>> xml.sub[0].template().render(name='eth0', type='ethernetCsmacd')
+    XML['if:interface']:
+    <if:interface xmlns:if="urn:some:interfaces" xmlns:ianaift="urn:some:iana-if-type" name="eth0">
+      <if:type>ianaift:ethernetCsmacd</if:type>
+    </if:interface>
+
+    Values and the literal text around slots are escaped:
+
+    >>> xml = XML['if'](descr="a&b <" + XML.Slot('name'))
+    >>> xml.template().render_bytes(name='<z>')
+    b'<if descr="a&amp;b &lt;&lt;z&gt;"/>'
+    """
+
+    # used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested class morexml.XML.Template
+    __qualname__ = "XML.Template"
+
+    def __init__(self, xml):
+        """Compile a template from `xml` tree with slot placeholders."""
+        # with all namespaces in scope ==> also of sub-tree's ancestors
+        prototype = copy_element(xml.element)
+        self._prototype = deepcopy(prototype)
+
+        names = []
+        locations = []
+        for element in prototype.iter(Element):
+            for xmlattr, value in element.items():
+                parts = SLOT_MARKER.split(value)
+                if len(parts) > 1:
+                    element.set(xmlattr, u'\ue002{}\ue003'.format(
+                        len(locations)))
+                    locations.append((element, xmlattr, parts))
+            text = element.text
+            if text is not None:
+                parts = SLOT_MARKER.split(text)
+                if len(parts) > 1:
+                    element.text = u'\ue002{}\ue003'.format(len(locations))
+                    locations.append((element, None, parts))
+
+        path_cache = {}
+        for _, _, parts in locations:
+            for name in parts[1::2]:
+                if name not in names:
+                    names.append(name)
+        self._names = tuple(names)
+        self._nameset = frozenset(names)
+
+        # element locations as child index paths, valid for all copies
+        self._locations = tuple(
+            (self._path(element, path_cache), xmlattr, tuple(parts))
+            for element, xmlattr, parts in locations)
+
+        # literal parts around the slots are escaped once here, and the
+        # slot values on every rendering
+        fragments = LOCATION_MARKER.split(tounicode(prototype))
+        for index in range(1, len(fragments), 2):
+            _, xmlattr, parts = locations[int(fragments[index])]
+            escape = escape_text if xmlattr is None else escape_xmlattr
+            fragments[index] = (escape, tuple(
+                part if odd % 2 else escape(part)
+                for odd, part in enumerate(parts)))
+        self._fragments = tuple(fragments)
+
+    @staticmethod
+    def _path(element, cache):
+        """Get the ``tuple`` of child indexes from the root to `element`."""
+        path = cache.get(element)
+        if path is None:
+            parent = element.getparent()
+            if parent is None:
+                path = ()
+            else:
+                path = Template._path(parent, cache) + (
+                    parent.index(element), )
+            cache[element] = path
+        return path
+
+    @property
+    def names(self):
+        """Get the ``tuple`` of all slot names in order of appearance."""
+        return self._names
+
+    def _check(self, values):
+        """Check that `values` has exactly one value per slot name."""
+        keys = set(values)
+        if keys != self._nameset:
+            missing = [name for name in self._names if name not in keys]
+            if missing:
+                raise TypeError(
+                    "{!r} is missing slot values: {}".format(
+                        self, ", ".join(map(repr, missing))))
+
+            raise TypeError(
+                "{!r} has no slots named {}".format(
+                    self, ", ".join(map(repr, sorted(keys - self._nameset)))))
+
+    def render(self, **values):
+        """
+        Create a new XML tree from the prototype with filled-in `values`.
+
+        Like instances of the factory classes, the tree becomes a sub-tree of
+        the XML tree from the current ``with`` context, if any
+        """
+        self._check(values)
+        texts = {name: unicode(value) for name, value in values.items()}
+        element = deepcopy(self._prototype)
+        for path, xmlattr, parts in self._locations:
+            target = element
+            for index in path:
+                target = target[index]
+            value = u''.join(
+                texts[part] if odd % 2 else part
+                for odd, part in enumerate(parts))
+            if xmlattr is None:
+                target.text = value
+            else:
+                target.set(xmlattr, value)
+        return XML._adopt(element)  # pylint: disable=protected-access
+
+    def render_bytes(self, **values):
+        """Create UTF-8 encoded XML text with filled-in `values`."""
+        self._check(values)
+        texts = {name: unicode(value) for name, value in values.items()}
+        fragments = self._fragments
+        chunks = [fragments[0]]
+        for index in range(1, len(fragments), 2):
+            escape, parts = fragments[index]
+            chunks.extend(
+                escape(texts[part]) if odd % 2 else part
+                for odd, part in enumerate(parts))
+            chunks.append(fragments[index + 1])
+        return u''.join(chunks).encode('utf-8')
+
+    def __repr__(self):
+        """Create a representation with the slot names."""
+        return "{}: {!r}".format(qualname(type(self)), list(self._names))
+
+
+# API: expose Slot and Template as nested classes of morexml.XML
+XMLMeta.Slot = Slot
+XMLMeta.Template = Template
@@ -0,0 +1,205 @@
+# moreXML >>> eXcitinglyMORE pythonicity on top of LXML's efficiency
+#
+# Copyright (C) 2019 ADVA Optical Networking SE
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Define the compiled, cached XSLT :class:`morexml.XML.Stylesheet`."""
+
+from __future__ import absolute_import
+
+import os
+from copy import copy
+from hashlib import sha1
+from threading import Lock, local
+
+import zetup
+from lxml.etree import (  # pylint: disable=no-name-in-module
+    XSLT, fromstring)
+from moretools import qualname
+from six import string_types, text_type as unicode
+
+import morexml
+from .meta import XMLMeta
+from .xml import XML
+from .xmlelement import make_parser
+from .xmllist import List
+
+__all__ = ('Stylesheet', )
+
+XSLT_NAMESPACE = 'http://www.w3.org/1999/XSL/Transform'
+
+
+class Stylesheet(zetup.object):
+    """
+    A compiled XSLT stylesheet for transforming XML trees.
+
+    Used by :meth:`morexml.XML.transform` and
+    :meth:`morexml.XML.List.transform`, which take stylesheets as XML trees
+    or file paths and compile every stylesheet only once:
+
+    >>> from morexml import XML
+
+    >>> stylesheet = XML(
+    ...     '<xsl:stylesheet version="1.0"'
+    ...     ' xmlns:xsl="http://www.w3.org/1999/XSL/Transform">'
+    ...     '<xsl:param name="unit"/>'
+    ...     '<xsl:template match="/interface">'
+    ...     '<port name="{@name}" unit="{$unit}"/>'
+    ...     '</xsl:template></xsl:stylesheet>')
+
+    >>> XML.Stylesheet.get(stylesheet)
+    XML.Stylesheet: ['unit']
+
+    >>> xml = XML['interface'](name='eth0')
+    >>> xml.transform(stylesheet, unit='1/1')
+    XML['port']:
+    <port name="eth0" unit="1/1"/>
+
+    The result trees are the lxml ``Element`` trees created by the XSLT
+    processor, which get their :class:`morexml.XML` instances on first
+    access, like for parsed XML. String parameter values are passed as
+    literal XSLT strings, and all other values as XPath expressions from
+    their text
+
+    Compiled stylesheets can be shared between threads. Every thread applies
+    its own copy
+    """
+
+    # used by zetup.meta's class __repr__ instead of __module__
+    __package__ = morexml
+
+    # API: reflect exposure as nested class morexml.XML.Stylesheet
+    __qualname__ = "XML.Stylesheet"
+
+    #: All compiled stylesheets by content digest or file path and digest.
+    _compiled = {}
+
+    #: Serializes loading and compiling of stylesheets.
+    _compiling = Lock()
+
+    def __init__(self, source):
+        """
+        Compile an XSLT stylesheet from `source`.
+
+        Which can be given as :class:`morexml.XML` tree or lxml ``Element``
+        """
+        element = source.element if isinstance(source, XML) else source
+        self._xslt = XSLT(element)
+        self._local = local()
+        self._names = tuple(element.xpath(
+            'xsl:param/@name', namespaces={'xsl': XSLT_NAMESPACE}))
+
+    @classmethod
+    def get(cls, stylesheet):
+        """
+        Get a compiled stylesheet for `stylesheet`.
+
+        Which is returned as is if already compiled, loaded with
+        :meth:`.load` if given as file path, or compiled only once per
+        content if given as :class:`morexml.XML` tree or lxml ``Element``.
+        The content is identified by the cached :meth:`morexml.XML.digest`,
+        together with the namespaces declared by the root element, which
+        XPath expressions in the stylesheet can use
+        """
+        if isinstance(stylesheet, cls):
+            return stylesheet
+
+        if isinstance(stylesheet, string_types):
+            return cls.load(stylesheet)
+
+        if not isinstance(stylesheet, XML):
+            # pylint: disable=protected-access
+            stylesheet = XML._wrap(stylesheet)
+        element = stylesheet.element
+        key = (stylesheet.digest(), frozenset(element.nsmap.items()))
+        with cls._compiling:
+            compiled = cls._compiled.get(key)
+            if compiled is None:
+                compiled = cls._compiled[key] = cls(element)
+        return compiled
+
+    @classmethod
+    def load(cls, path):
+        """
+        Get the compiled stylesheet from file `path`.
+
+        Every file is only compiled once, and compiled again when its
+        content changes. Relative includes and imports are resolved from
+        the file's location
+        """
+        path = os.path.abspath(path)
+        with open(path, 'rb') as source:
+            content = source.read()
+        key = (path, sha1(content).digest())
+        with cls._compiling:
+            compiled = cls._compiled.get(key)
+            if compiled is None:
+                compiled = cls._compiled[key] = cls(fromstring(
+                    content, make_parser(), base_url=path))
+        return compiled
+
+    def _thread_xslt(self):
+        """Get the copy of the compiled XSLT for the current thread."""
+        xslt = getattr(self._local, 'xslt', None)
+        if xslt is None:
+            xslt = self._local.xslt = copy(self._xslt)
+        return xslt
+
+    @staticmethod
+    def _params(params):
+        """Convert `params` values to XSLT parameter expressions."""
+        return {
+            name: XSLT.strparam(value) if isinstance(value, string_types)
+            else unicode(value)
+            for name, value in params.items()}
+
+    def _apply(self, xslt, xml, params):
+        """Apply `xslt` to `xml` tree and get the result's root ``Element``."""
+        root = xslt(xml.element, **params).getroot()
+        if root is None:
+            raise ValueError(
+                "{!r} created no XML tree from {!r}".format(self, xml))
+
+        return root
+
+    def transform(self, xml, **params):
+        """
+        Transform `xml` tree and get the result as new XML tree.
+
+        Like instances of the factory classes, the new tree becomes a
+        sub-tree of the XML tree from the current ``with`` context, if any
+        """
+        root = self._apply(self._thread_xslt(), xml, self._params(params))
+        return XML._adopt(root)  # pylint: disable=protected-access
+
+    def transform_all(self, xmls, **params):
+        """Transform all `xmls` and get an :class:`morexml.XML.List`."""
+        xslt = self._thread_xslt()
+        params = self._params(params)
+        adopt = XML._adopt  # pylint: disable=protected-access
+        return List([
+            adopt(self._apply(xslt, xml, params)) for xml in xmls])
+
+    @property
+    def names(self):
+        """Get the ``tuple`` of all top-level ``xsl:param`` names."""
+        return self._names
+
+    def __repr__(self):
+        """Create a representation with the stylesheet's parameter names."""
+        return "{}: {!r}".format(qualname(type(self)), list(self._names))
+
+
+# API: expose Stylesheet as nested class morexml.XML.Stylesheet
+XMLMeta.Stylesheet = Stylesheet